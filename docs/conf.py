@@ -52,7 +52,9 @@ extensions = [
 ]
 
 # number of days to cache remotely downloaded 'inv' files (default = 5)
-intersphinx_cache_limit = 1
+# Inventories rarely change; keep them long enough to be reused across builds.
+# (Sphinx >= 2.1 fetches the inventories below concurrently.)
+intersphinx_cache_limit = 30
 
 intersphinx_mapping = {
 	'astropy'    : ('https://docs.astropy.org/en/stable/', None)
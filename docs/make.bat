@@ -9,6 +9,9 @@ if "%SPHINXBUILD%" == "" (
 )
 set SOURCEDIR=.
 set BUILDDIR=_build
+if "%SPHINXOPTS%" == "" (
+	set SPHINXOPTS=-j auto
+)
 
 if "%1" == "" goto help
 
@@ -1,17 +1,32 @@
 
 import os
-import pdb
 import json
-import logging
 import pathlib
-from typing import Dict, Union
+import urllib.parse
+import concurrent.futures
+from typing import Dict, List, Tuple, Union
 
 import requests
 
 from .exc import ErrorInAccessingAPI
+from .cache import SciDDCacheManager, LocalAPICache, json_loads
+from .http import create_session
+from .logger import scidd_logger as logger
 from scidd.core.utilities.designpatterns import singleton,SingletonMeta
 
-logger = logging.getLogger("scidd.core")
+# message used when the server returns an error (HTTP 500)
+_SERVER_ERROR_MESSAGE = "\n".join([
+	"An error occurred on the server in accessing the API.",
+	"Please contact Demitri Muna <demitri.muna@utsa.edu> with this full error message.",
+	"URL: {url}",
+	"Response:",
+	"{response}"
+])
+
+# A single session (and its connection pool) shared by every API instance so that
+# repeated requests don't each pay for a new TCP+TLS handshake.
+_SESSION = create_session(pool_connections=4, pool_maxsize=32, headers={"Accept" : "application/json"},
+						  status_forcelist=[502,503,504])
 
 #@singleton
 #class API:
@@ -19,24 +34,53 @@ class API(metaclass=SingletonMeta):
 	def __init__(self, host:str="api.trillianverse.org", port:int=443):
 
 		self._host = host
-		self.port = port
+		self._port = port
+
+		self.use_local_cache = True # store GET responses in the local API cache
+		self.cache_ttl = 3600 # seconds a cached response is considered valid; None = never expires
 
 		if "SCIDD_API_HOST" in os.environ:
 			self._host = os.environ["SCIDD_API_HOST"]
 		if "SCIDD_API_PORT" in os.environ:
-			self.port = int(os.environ["SCIDD_API_PORT"])
+			self._port = int(os.environ["SCIDD_API_PORT"])
 
 		if self._host in ["127.0.0.1", "localhost"]:
-			self.scheme = "http://" # for development
+			self._scheme = "http://" # for development
 		else:
-			self.scheme = "https://"
+			self._scheme = "https://"
+
+		self._update_base_url()
+
+	@property
+	def session(self) -> requests.Session:
+		'''
+		The HTTP session used to communicate with the API; this is shared by all instances.
+		'''
+		return _SESSION
+
+	def close(self):
+		'''
+		Close the pooled connections used to communicate with the API.
+		'''
+		_SESSION.close()
+
+	@property
+	def localAPICache(self) -> LocalAPICache:
+		'''
+		The local database used to cache API responses; this is the one owned by the default cache manager.
+		'''
+		return SciDDCacheManager.defaultCache().localAPICache
 
 	@property
 	def base_url(self) -> str:
 		'''
 		Returns the base URL for the API, e.g. "https://api.trillianverse.org".
 		'''
-		return f"{self.scheme}{self.host}:{self.port}"
+		# built once and updated when the host, port, or scheme change since it's used on every call
+		return self._base_url
+
+	def _update_base_url(self):
+		self._base_url = f"{self._scheme}{self._host}:{self._port}"
 
 	@property
 	def host(self) -> str:
@@ -46,14 +90,41 @@ class API(metaclass=SingletonMeta):
 	def host(self, new_host):
 		self._host = new_host
 		if new_host in ["127.0.0.1", "localhost"]:
-			self.scheme = "http://" # for development
+			self._scheme = "http://" # for development
+		self._update_base_url()
+
+	@property
+	def port(self) -> int:
+		return self._port
+
+	@port.setter
+	def port(self, new_port:int):
+		self._port = new_port
+		self._update_base_url()
+
+	@property
+	def scheme(self) -> str:
+		'''
+		The scheme used to connect to the API, including the separator, e.g. "https://".
+		'''
+		return self._scheme
+
+	@scheme.setter
+	def scheme(self, new_scheme:str):
+		self._scheme = new_scheme
+		self._update_base_url()
 
 	def get(self, path:Union[str, pathlib.Path], params:dict=None, headers:dict=None) -> dict:
 		'''
 		Make a GET call on the SciDD API with the given path and parameters.
 
+		Responses are stored in the local API cache (see :py:attr:`localAPICache`) for
+		:py:attr:`cache_ttl` seconds; repeated calls within that time are not sent to the server.
+		Once expired, an entry is revalidated with the server using the ``ETag``/``Last-Modified``
+		headers of the original response so that an unchanged response does not need to be downloaded again.
+
 		:param path: the path of the API to call
-		:param params: a dictionary of the parameters to pass to the API
+		:param params: the parameters to pass to the API, as a dictionary or a list of ``(name, value)`` tuples
 		:param headers: any additional headers to pass to the API
 		:returns: JSON response
 		:raises: see: https://2.python-requests.org/en/master/api/#exceptions
@@ -61,56 +132,84 @@ class API(metaclass=SingletonMeta):
 		#if path is None:
 		#	raise ValueError("A path must be provided to make an API call.")
 		if params is None:
-			params = list()
+			params = dict()
 
-		with requests.Session() as http_session:
-			try:
-				response = http_session.get(self.base_url + path, params=params)
-			except requests.exceptions.ConnectionError as e:
-				if "Max retries exceeded" in str(e):
-					raise Exception(f"Unable to reach the API server; is the server down?\n{e}")
-				else:
-					raise e
-
-			status_code = None
+		headers = dict() if headers is None else dict(headers)
+
+		cache = None
+		cache_key = None
+		cached = None
+		if self.use_local_cache:
+			# A cache that can't be used (e.g. the directory can't be created) is not an error; the server is asked instead.
 			try:
-				response.raise_for_status()
-			except requests.HTTPError as e:
-				status_code = e.response.status_code
-				logger.debug(f"HTTP status code={status_code}")
-
-				# "Absorb" the exception so the trace doesn't go all the way down
-				# to the requests package, then check for and raise a custom error below.
-				pass
-
-			if status_code is None:
-				# no error occurred
-				pass
-			elif status_code == 500: # "Server Error"
-				# a problem occurred on the server returning the response
-				raise ErrorInAccessingAPI("\n".join([
-					f"An error occurred on the server in accessing the API.",
-					f"Please contact Demitri Muna <demitri.muna@utsa.edu> with this full error message.",
-					f"URL: {response.url}",
-					"Response:",
-					f"{json.dumps(response.json(), indent=4)}"
-				]))
-			else:
-				raise Exception(f"Unhandled HTTP error status code: {status_code}")
+				cache = self.localAPICache # looked up once per call
+				items = params.items() if isinstance(params, dict) else params
+				cache_key = f"{self.base_url}{path}?{urllib.parse.urlencode(sorted(items), doseq=True)}"
+				try:
+					return cache.parsedValue(cache_key)
+				except KeyError:
+					pass # not cached or expired
+				cached = cache.record(cache_key)
+			except Exception as e:
+				logger.debug(f"Unable to read from the local API cache: {e}")
+				cache = None
+				cache_key = None
+				cached = None
+			if cached is not None:
+				# expired; ask the server if it has changed
+				if cached["etag"]:
+					headers["If-None-Match"] = cached["etag"]
+				if cached["last_modified"]:
+					headers["If-Modified-Since"] = cached["last_modified"]
 
-		# check if we hit the server cache
-		try:
-			if response.headers["X-Proxy-Cache"] == "HIT":
-				logger.debug(f"== CACHE HIT == The response was found in the Nginx proxy cache, not calculated by the API.")
-		except:
-			pass
+		response = self._request("GET", path, params=params, headers=headers)
+
+		if response.status_code == 304 and cached is not None: # "Not Modified"
+			# the cached response is still valid; renew it
+			self._save_to_local_cache(cache, cache_key, cached["json_response"], response,
+									  etag=cached["etag"], last_modified=cached["last_modified"])
+			return json_loads(cached["json_response"])
+
+		if cache_key is not None:
+			self._save_to_local_cache(cache, cache_key, response.text, response)
 
-		return response.json()
+		return json_loads(response.content)
+
+	def getMany(self, calls:List[Tuple[str, dict]], max_workers:int=8) -> List[dict]:
+		'''
+		Make several GET calls on the SciDD API concurrently.
+
+		This is useful when resolving many SciDDs at once; the calls share the API's connection pool,
+		so ``max_workers`` should not exceed the pool size (32).
+
+		:param calls: a list of ``(path, params)`` tuples, each as would be passed to :py:meth:`get`
+		:param max_workers: the maximum number of calls to be in flight at the same time
+		:returns: a list of JSON responses in the same order as ``calls``
+		'''
+		with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+			return list(executor.map(lambda call: self.get(call[0], params=call[1]), calls))
+
+	def _save_to_local_cache(self, cache:LocalAPICache, key:str, value:str, response:requests.Response, etag:str=None, last_modified:str=None):
+		'''
+		Write a response to the local API cache, along with the HTTP validators needed to revalidate it later.
+
+		The database is written in the background so the caller doesn't wait on the disk; the response
+		can be read back from the cache immediately. Failing to write to the cache is not an error.
+		'''
+		try:
+			cache.set(key, value, ttl=self.cache_ttl,
+					  etag=response.headers.get("ETag", etag),
+					  last_modified=response.headers.get("Last-Modified", last_modified),
+					  background=True)
+		except Exception as e: # e.g. sqlite3.Error, OSError
+			logger.debug(f"Unable to save API response to the local cache: {e}")
 
 	def post(self, path:Union[str, pathlib.Path], params:dict=None, data:dict=None, headers:Dict[str,str]=None) -> dict:
 		'''
 		Make a POST call on the Trillian API with the given path, parameters, and body.
 
+		Responses to POST calls are not cached.
+
 		:param path: the path of the API to call
 		:param params: a dictionary of the parameters to pass to the API
 		:param data: data to be passed as the body of the call
@@ -120,48 +219,52 @@ class API(metaclass=SingletonMeta):
 		'''
 		#if path is None:
 		#	raise ValueError("A path must be provided to make an API call.")
+		return json_loads(self._request("POST", path, params=params, data=data, headers=headers).content)
 
-		if params is None:
-			params = dict()
-		if data is None:
-			data = dict()
-		if headers is None:
-			header = dict()
-
-		raise NotImplementedError()
+	def _request(self, method:str, path:Union[str, pathlib.Path], params:dict=None, data:dict=None, headers:Dict[str,str]=None) -> requests.Response:
+		'''
+		Send a request to the API and translate connection and HTTP errors into the exceptions raised by this class.
 
-		with requests.Session() as http_session:
-			try:
-				response = http_session.post(self.base_url + path, params=params, data=data)
-			except requests.exceptions.ConnectionError as e:
-				if "Max retries exceeded" in str(e):
-					raise Exception(f"Unable to reach the API server; is the server down?\n{e}")
-				else:
-					raise e
-
-			status_code = None
-			try:
-				response.raise_for_status()
-			except requests.HTTPError as e:
-				status_code = e.response.status_code
-				logger.debug(f"HTTP status code={status_code}")
-
-				# "Absorb" the exception so the trace doesn't go all the way down
-				# to the requests package, then check for and raise a custom error below.
-				pass
-
-			if status_code is None:
-				# no error occurred
-				pass
-			elif status_code == 500: # "Server Error"
-				# a problem occurred on the server returning the response
-				raise ErrorInAccessingAPI("\n".join([
-					f"An error occurred on the server in accessing the API.",
-					f"Please contact Demitri Muna <demitri.muna@utsa.edu> with this full error message.",
-					f"URL: {response.url}",
-					"Response:",
-					f"{json.dumps(response.json(), indent=4)}"
-				]))
+		:param method: the HTTP method, e.g. "GET" or "POST"
+		:param path: the path of the API to call
+		:param params: a dictionary of the parameters to pass to the API
+		:param data: data to be passed as the body of the call
+		:param headers: any additional headers to pass to the API
+		:returns: the response object (which may have a "304 Not Modified" status for conditional requests)
+		'''
+		try:
+			response = self.session.request(method, self.base_url + path, params=params, data=data, headers=headers)
+		except requests.exceptions.ConnectionError as e:
+			if "Max retries exceeded" in str(e):
+				raise Exception(f"Unable to reach the API server; is the server down?\n{e}")
 			else:
-				raise Exception(f"Unhandled HTTP error status code: {status_code}")
+				raise e
+
+		status_code = None
+		try:
+			response.raise_for_status()
+		except requests.HTTPError as e:
+			status_code = e.response.status_code
+			logger.debug(f"HTTP status code={status_code}")
+
+			# "Absorb" the exception so the trace doesn't go all the way down
+			# to the requests package, then check for and raise a custom error below.
+			pass
+
+		if status_code is None:
+			# no error occurred
+			pass
+		elif status_code == 500: # "Server Error"
+			# a problem occurred on the server returning the response
+			raise ErrorInAccessingAPI(_SERVER_ERROR_MESSAGE.format(url=response.url, response=json.dumps(response.json(), indent=4)))
+		else:
+			raise Exception(f"Unhandled HTTP error status code: {status_code}")
+
+		# check if we hit the server cache
+		try:
+			if response.headers["X-Proxy-Cache"] == "HIT":
+				logger.debug(f"== CACHE HIT == The response was found in the Nginx proxy cache, not calculated by the API.")
+		except:
+			pass
 
+		return response
@@ -6,17 +6,67 @@ from __future__ import annotations # remove in Python 3.10
 import os
 import re
 import abc
-import pdb
-import scidd
+import json
 import pathlib
+import time
+import atexit
 import sqlite3
+import functools
+import threading
 import contextlib
-from typing import Union
+import collections
+import concurrent.futures
+from typing import Union, TYPE_CHECKING
 
 from .logger import scidd_logger as logger
 
+try:
+	# orjson parses several times faster than the standard library; it's optional
+	from orjson import loads as json_loads
+except ImportError:
+	json_loads = json.loads
+
+if TYPE_CHECKING:
+	from .scidd import SciDDFileResource # annotations only; avoids a circular import
+
+# Version of the local API cache database schema. If an existing database
+# has an older version, the cache table is recreated (see LocalAPICache).
+DATABASE_VERSION = 4
+
+# SQL used on every cache lookup/write; keeping the same text lets sqlite3 reuse its prepared statements
+_SQL_SELECT = "SELECT json_response, expires, etag, last_modified FROM cache WHERE query=?"
+_SQL_REPLACE = "REPLACE INTO cache (query, json_response, expires, etag, last_modified) VALUES (?,?,?,?,?);"
+_CACHED_STATEMENTS = 256 # size of each connection's prepared statement cache
+
+# If the SQLite library is in "serialized" mode a connection can be used from several threads at once
+# without extra locking. (Python < 3.11 always reports 1 here, in which case a lock is used.)
+_SQLITE_SERIALIZED = sqlite3.threadsafety == 3
+
+# matches e.g. "astro/file/galex/gr6"; the "/file/" component is dropped from cache paths
+_PATH_WITHIN_CACHE_RE = re.compile(r"^([^/]+)/file/(.+)")
+
+@functools.lru_cache(maxsize=4096)
+def _compute_path_within_cache(scidd_path:str) -> str:
+	'''
+	Returns the default path within the cache for the given SciDD path (see ``SciDDCacheManager.pathWithinCache``).
+
+	This is memoized by the path string so that different SciDD objects with the same path share the result.
+	'''
+	# directory of the path using plain string operations (no pathlib objects are created)
+	i = scidd_path.rfind("/")
+	p = scidd_path[:i].lstrip("/") if i > 0 else ""
+	assert not p.startswith("/"), "This causes problems!" # (asserts are skipped under 'python -O')
+
+	# remove the "/file/" component; it's redundant
+	match = _PATH_WITHIN_CACHE_RE.match(p)
+	if match:
+		p = match.group(1) + "/" + match.group(2)
+	return p
+
 class SciDDCacheManagerBase(metaclass=abc.ABCMeta):
 
+	_conforming_classes = set() # classes that have passed conformsToInterface()
+
 	@property
 	@abc.abstractmethod
 	def path(self) -> pathlib.Path:
@@ -67,6 +117,11 @@ class SciDDCacheManagerBase(metaclass=abc.ABCMeta):
 
 		It's recommended that this be called in the ``__init__`` method of any class that is acting as a SciDD cache manager.
 		'''
+		# the interface is a property of the class, so only check each class once
+		cls = type(instance)
+		if cls in SciDDCacheManagerBase._conforming_classes:
+			return True
+
 		# check required properties
 		for prop in ['path', 'localAPICache']:
 			hasattr(instance, prop) # Oddly, returns 'False' the first time, 'True' the second (if available).
@@ -77,6 +132,9 @@ class SciDDCacheManagerBase(metaclass=abc.ABCMeta):
 		if not callable(instance.pathWithinCache):
 			raise TypeError(f"This class is a virtual subclass of scidd.SciDDCacheManagerBase; it must implement the method 'pathWithinCache'.")
 
+		SciDDCacheManagerBase._conforming_classes.add(cls)
+		return True
+
 class SciDDCacheManager(SciDDCacheManagerBase):
 	'''
 	A class that manages the data files retrieved by SciDDs; useful for repeated script runs.
@@ -96,7 +154,8 @@ class SciDDCacheManager(SciDDCacheManagerBase):
 		else:
 			raise Exception(f"'path' must either be a str or os.PathLike object; was given '{type(path)}'.")
 
-		self._cache_parent_directory = path # creates directory if it doesn't exist
+		self._cache_parent_directory = path
+		self._validated = False # the directory is created/checked on first use (see _ensure_validated)
 
 	@classmethod
 	def defaultCache(cls):
@@ -107,14 +166,18 @@ class SciDDCacheManager(SciDDCacheManagerBase):
 		There is only one instance of the default cache manager at any time, but it can be modified.
 		'''
 		if cls._default_instance is None:
-			cls._default_instance = cls() # use defaults
+			with _default_caches_lock:
+				if cls._default_instance is None:
+					cls._default_instance = cls() # use defaults; nothing is written to disk until the cache is used
 		return cls._default_instance
 
 	@property
 	def path(self) -> pathlib.Path:
 		'''
-		The directory used to download files to.
+		The directory used to download files to. It is created if it doesn't exist.
 		'''
+		if not self._validated:
+			self._ensure_validated()
 		return self._cache_parent_directory
 
 	@path.setter
@@ -122,6 +185,8 @@ class SciDDCacheManager(SciDDCacheManagerBase):
 		'''
 		Set the top level cache to the provided directory.
 
+		The directory is created and checked when it's first used rather than here.
+
 		:param new_path: the path to set for the cache
 		'''
 		if new_path is None:
@@ -129,28 +194,39 @@ class SciDDCacheManager(SciDDCacheManagerBase):
 		elif isinstance(new_path, str):
 			new_path = pathlib.Path(new_path)
 
-		if new_path.exists() is False:
+		self._cache_parent_directory = new_path
+		self._validated = False
+
+	def _ensure_validated(self):
+		'''
+		Create the cache directory if needed and check that it can be used; this is only done once per path.
+		'''
+		path = self._cache_parent_directory
+
+		if path.exists() is False:
 			try:
-				new_path.mkdir(exist_ok=True)
+				path.mkdir(exist_ok=True)
 			except PermissionError as e:
-				raise PermissionError(f"You do not have permission to write to the provided cache path ('{new_path}'). Error: {e}")
+				raise PermissionError(f"You do not have permission to write to the provided cache path ('{path}'). Error: {e}")
 
-		# is the directory actually a directory and writable?
-		if os.path.isdir(new_path) == False:
-			raise Exception(f"The provided cache directory value ('{new_path}') is not a directory.")
-		elif os.access(new_path, mode=os.W_OK) == False:
-			raise Exception(f"The provided cache directory ({new_path}) is not writable (check permissions?).")
+		# is the directory actually a directory? (Whether it's writable isn't checked here; os.access() doesn't
+		# account for ACLs or read-only file systems. Writing a file to it raises an error if it isn't.)
+		if os.path.isdir(path) == False:
+			raise Exception(f"The provided cache directory value ('{path}') is not a directory.")
 
-		self._cache_parent_directory = new_path
+		self._validated = True
 
 	@property
 	def localAPICache(self) -> LocalAPICache:
 		'''
 		A local database that caches API responses.
+
+		The database is kept in the cache directory; it's created when it's first used, not here.
 		'''
-		if not hasattr(self, '_localAPICache'):
-			self._localAPICache = LocalAPICache.defaultCache()
-			self._localAPICache.path = self.path
+		# (self._cache_parent_directory is used instead of self.path since the latter creates the directory)
+		if not hasattr(self, '_localAPICache') or self._localAPICache.path != self._cache_parent_directory:
+			# LocalAPICache.path is read-only; create a new cache if this manager's path has changed
+			self._localAPICache = LocalAPICache(path=self._cache_parent_directory)
 			#self._localAPICache.parentCache = self
 		return self._localAPICache
 
@@ -161,110 +237,229 @@ class SciDDCacheManager(SciDDCacheManagerBase):
 		This can be domain-specific, e.g. a collection that has millions of files might be better served
 		with a custom scheme. It's recommended to subclass this class for such files.
 		'''
-		# remove prefix and leading "/"
-
-		try:
-			return sci_dd._path_within_cache[self]
-		except KeyError:
-			p = str(pathlib.Path(sci_dd.path).parent).lstrip("/")
-			assert not p.startswith("/"), "This causes problems!"
-
-			# remove the "/file/" component; it's redundant
-			match = re.search(r"^([^/]+)/file/(.+)", p)
-			if match:
-				p = f"{match.group(1)}/{match.group(2)}"
-			sci_dd._path_within_cache[self] = p
-			#logger.debug(f" path_within_cache = '{p}'")
-			return p
+		# remove prefix and leading "/"; the result only depends on the path string and is memoized by it
+		return _compute_path_within_cache(sci_dd.path)
 
 class LocalAPICache:
 	'''
 	This class manages a local database that caches requests/responses to the API to improve performance on repeated script runs.
 
-	The cache is thread-safe and multiprocessing safe.
+	The cache is thread-safe and multiprocessing safe. The most recently used entries are also kept in memory;
+	this in-memory copy is per process, so a value written by another process may not be seen until it is evicted.
 
 	This class should be considered a private implementation detail and is not intended to be interacted with
 	outside of this package.
 
 	:param path: path where the database will be written to or found
 	:param name: name of the cache file, defaults to ``_SciDD_API_Cache.sqlite``
+	:param memory_cache_size: the number of recently used entries kept in memory; defaults to ``LocalAPICache.default_memory_cache_size``
 	'''
 
 	_default_instance = None
 
-	def __init__(self, path:os.PathLike=pathlib.Path.home()/".scidd_cache", name:str="_SciDD_API_Cache.sqlite"):
-
-		self._dbFilepath = path / name # the full path + filename for the cache
-
-		# create database path if needed
-		if not path.exists():
-			try:
-				os.makedirs(path)
-			except FileExistsError as e:
-				logger.debug(f"Path '{path}' appears not to exist, but 'os.makedirs(path)' is raising FileExistsError: {e}")
-			except OSError as e:
-				raise OSError(f"Unable to create specified path '{path}'; error: {e} ")
-
-		if path.is_symlink(): # or os.path.islink(fp)
-			if not os.path.exists(os.readlink(path)):
-				# broken link
-				raise Exception(f"The path where the SciDD cache is expected ('{path}') is symlink pointing to a target that is no longer there. " +
-			                    "Either remove the symlink or fix the destination.")
-
-		self._initialize_database()
+	default_memory_cache_size = 1024 # number of recently used entries kept in memory (per process) by new instances
+
+	_symlink_checked = set() # cache directories already checked for being a broken symlink
+
+	def __init__(self, path:os.PathLike=pathlib.Path.home()/".scidd_cache", name:str="_SciDD_API_Cache.sqlite", memory_cache_size:int=None):
+
+		# Note: no disk access happens here; the directory and database are
+		# created on first use (see dbFilepath) so that code that never makes
+		# an API call doesn't pay for it.
+		self._dbFilepath = pathlib.Path(path) / name # the full path + filename for the cache
+		# Recently used entries are kept in memory (least recently used are dropped first) so that repeated
+		# lookups don't go to SQLite at all. This is per process; key -> record dict (see record())
+		self.memory_cache_size = LocalAPICache.default_memory_cache_size if memory_cache_size is None else memory_cache_size
+		self._memory = collections.OrderedDict()
+		self._memory_lock = threading.Lock()
+		self._initialized = False
+		self._init_lock = threading.Lock()
+
+		# SQLite connections are kept open and reused: one reader and one writer shared by all threads (see _connection)
+		self._local = threading.local() # per thread state, i.e. values pending in batch()
+		self._reader = None
+		self._writer = None
+		self._read_lock = threading.Lock()
+		self._connections = list() # every connection opened, so they can all be closed
+		self._write_lock = threading.Lock()
+		self._close_registered = False # see _add_connection
 
 	@property
 	def dbFilepath(self) -> os.PathLike:
 		'''
 		Returns the path of the SQLite database cache.
 		'''
-		# The main purpose of this method is to check that the database exists and
-		# create it if it doesn't or was deleted during the run of a program.
+		# The database is created on first use. This doesn't check the file on every access (that would be
+		# two stat() calls per cache operation); if it's deleted while the program runs the failing query
+		# triggers a rebuild instead (see _with_recovery).
+		if not self._initialized:
+			with self._init_lock: # several threads may use a new cache at once
+				if not self._initialized:
+					self._initialize_database()
+		return self._dbFilepath
+
+	def _with_recovery(self, operation):
+		'''
+		Call ``operation()``, rebuilding the database and trying once more if it fails because the file was deleted or emptied.
+		'''
+		try:
+			return operation()
+		except sqlite3.OperationalError:
+			if not self._recover_database():
+				raise
+		return operation()
 
-		if self._dbFilepath.exists():
-			if self._dbFilepath.stat().st_size == 0: # size in bytes
+	def _recover_database(self) -> bool:
+		'''
+		Recreate the database if the file is missing or empty. Returns ``True`` if it was recreated.
+		'''
+		with self._init_lock:
+			if self._dbFilepath.exists():
+				if self._dbFilepath.stat().st_size > 0: # size in bytes
+					return False # a real error, e.g. the database is locked
+				self.close() # open connections point to the old file
 				self._dbFilepath.unlink()
-				self._initialize_database()
-		else:
+			else:
+				self.close()
+			logger.debug(f"The local API cache database ('{self._dbFilepath}') was removed; recreating it.")
 			self._initialize_database()
-
-		return self._dbFilepath
+		return True
 
 	@property
 	def path(self) -> pathlib.Path:
 		'''
  		The full path where the cache database can be found (not including the filename).
 		'''
-		return self.dbFilepath.parent
+		return self._dbFilepath.parent
 
 	@classmethod
 	def defaultCache(cls) -> LocalAPICache:
 		'''
 		A local API cache that is preconfigured with default values designed to be used out of the box (batteries included).
 
-		By default a shared instance of :class:`SciDDCacheManager` is returned.
+		This is the API cache of the default :class:`SciDDCacheManager` (and so follows changes to its path).
 		The default cache is located at ``$HOME/.scidd_cache``, but can be changed by the user.
 		There is only one instance of the default cache manager at any time, but it can be modified.
 		'''
+		if cls is LocalAPICache:
+			return SciDDCacheManager.defaultCache().localAPICache
 		if cls._default_instance is None:
-			cls._default_instance = cls(path=SciDDCacheManager.defaultCache().path) # use defaults
+			with _default_caches_lock:
+				if cls._default_instance is None:
+					cls._default_instance = cls(path=SciDDCacheManager.defaultCache()._cache_parent_directory) # use defaults
 		return cls._default_instance
 
-	# @property
-	# def db_conn(self) -> sqlite3.Connection:
-	# 	'''
-	# 	An open connection to the SQLite database.
-	# 	'''
-	# 	if self._db is None:
-	# 		self._initial_database_connection() # defines self._db
-	# 	return self._db
+	def _connection(self, read_only:bool=False) -> sqlite3.Connection:
+		'''
+		Returns an open connection to the SQLite database, creating it on first use.
+
+		Reusing connections avoids the cost of opening the database on every lookup and keeps SQLite's page cache warm.
+		There is a single read-only connection shared by all threads (with WAL, readers don't block the writer),
+		and a single writable connection in autocommit mode (``isolation_level=None``), also shared by all threads.
+		Writes are serialized by ``_write_lock``, so more writers would not add any concurrency, only open files.
+
+		:param read_only: if ``True``, return the shared connection opened with ``mode=ro``
+		'''
+		db_filepath = self.dbFilepath # checks the database exists, creating it if needed
+		if read_only:
+			connection = self._reader
+			if connection is None:
+				with self._read_lock:
+					if self._reader is None:
+						# use URI method to supply connection options (here, read-only)
+						# this demonstrates a simple implementation: https://stackoverflow.com/a/47240886/2712652
+						connection = sqlite3.connect(f"file:{db_filepath}?mode=ro", uri=True, timeout=30, check_same_thread=False, cached_statements=_CACHED_STATEMENTS)
+						self._configure_db_connection(connection, read_only=True)
+						self._add_connection(connection)
+						self._reader = connection
+					connection = self._reader
+			return connection
+
+		connection = self._writer
+		if connection is None:
+			with self._write_lock:
+				if self._writer is None:
+					connection = sqlite3.connect(db_filepath, isolation_level=None, timeout=30, check_same_thread=False, cached_statements=_CACHED_STATEMENTS)
+					self._configure_db_connection(connection)
+					self._add_connection(connection)
+					self._writer = connection
+				connection = self._writer
+		return connection
+
+	def _add_connection(self, connection:sqlite3.Connection):
+		if not self._close_registered:
+			# once per instance; connections are reopened after close() (e.g. when the database is recovered)
+			self._close_registered = True
+			atexit.register(self._close_at_exit)
+		self._connections.append(connection)
+
+	def _read(self, sql:str, parameters:tuple) -> sqlite3.Row:
+		'''
+		Run a query on the shared read-only connection and return the first row (or ``None``).
+		'''
+		connection = self._connection(read_only=True)
+		if _SQLITE_SERIALIZED:
+			return connection.execute(sql, parameters).fetchone()
+		with self._read_lock: # the SQLite library can't be used from several threads at once on one connection
+			return connection.execute(sql, parameters).fetchone()
+
+	def close(self):
+		'''
+		Close all open connections to the database. New connections will be opened if the cache is used again.
+		'''
+		connections, self._connections = self._connections, list()
+		self._reader = None
+		self._writer = None
+		for connection in connections:
+			try:
+				connection.execute("PRAGMA optimize") # recommended before closing; fails harmlessly on read-only connections
+			except sqlite3.Error:
+				pass
+			try:
+				connection.close()
+			except sqlite3.Error:
+				pass
+
+	def flush(self):
+		'''
+		Wait until all values set with ``background=True`` (see :py:meth:`set`) have been written to the database.
+		'''
+		executor = _background_writer_instance
+		if executor is None:
+			return
+		try:
+			executor.submit(lambda: None).result() # the writer runs one task at a time, in order
+		except RuntimeError:
+			pass # already shut down, which waits for pending writes
+
+	def _close_at_exit(self):
+		self.flush() # background writes need the connections
+		self.close()
 
 	def _initialize_database(self):
 		'''
 		Make the initial connection to the database, creating file/schema as needed.
 		'''
-		#db_filepath = self.path / self.name
-		is_new_database = not self._dbFilepath.exists() # not db_filepath.exists()
+		path = self._dbFilepath.parent
+
+		# create database path if needed
+		try:
+			path.mkdir(parents=True, exist_ok=True)
+		except FileExistsError:
+			pass # a file or broken symlink is in the way; checked below
+		except OSError as e:
+			raise OSError(f"Unable to create specified path '{path}'; error: {e} ")
+
+		if path not in LocalAPICache._symlink_checked:
+			if path.is_symlink(): # or os.path.islink(fp)
+				if not os.path.exists(os.readlink(path)):
+					# broken link
+					raise Exception(f"The path where the SciDD cache is expected ('{path}') is symlink pointing to a target that is no longer there. " +
+				                    "Either remove the symlink or fix the destination.")
+			LocalAPICache._symlink_checked.add(path)
+
+		# (an empty file, e.g. left by an interrupted first run, is treated as a new database)
+		is_new_database = not self._dbFilepath.exists() or self._dbFilepath.stat().st_size == 0
 
 		#with contextlib.closing(sqlite3.connect(self.dbFilepath, timeout=20)) as connection:
 		#	with contextlib.closing(connection()) cursor as cursor):
@@ -273,89 +468,303 @@ class LocalAPICache:
 			connection = sqlite3.connect(self._dbFilepath, timeout=20)
 		except sqlite3.OperationalError as e:
 			if is_new_database:
-				raise Exception(f"Unable to create database at specified path ('{db_filepath}').")
+				raise Exception(f"Unable to create database at specified path ('{self._dbFilepath}').")
 			else:
-				raise Exception(f"Found file at path '{path / self.name}', but am unable to open as an SQLite database.")
+				raise Exception(f"Found file at path '{self._dbFilepath}', but am unable to open as an SQLite database.")
 
 		with contextlib.closing(connection):
 			# configure connection-level settings on the SQLite database
 			# ----------------------------------------------------------
 			#connection.isolation_level = None    # autocommit mode; transactions can be explicitly created with BEGIN/COMMIT statements
-			connection.row_factory = sqlite3.Row  # return dictionaries instead of tuples from SELECT statements
+			self._configure_db_connection(connection)
 
-			#self._configure_db_connection(self.db_conn)
+			# Write-ahead logging lets readers continue while a write is in progress and
+			# needs fewer fsyncs per commit. This setting is persistent (stored in the database file).
+			# Ref: https://www.sqlite.org/wal.html
+			connection.execute("PRAGMA journal_mode=WAL")
 
-			if is_new_database:
+			version = None if is_new_database else self._database_version(connection)
+			if version is None:
+				# a new database, or one whose schema was never created (e.g. the first run was interrupted)
 				self._init_sqlite_db(connection)
+			elif version < DATABASE_VERSION:
+				self._migrate_sqlite_db(connection, from_version=version)
+
+		self._initialized = True
+
+	def _configure_db_connection(self, dbconn:sqlite3.Connection, read_only:bool=False):
+		'''
+		Configure connection-level settings on the SQLite database.
 
-	#def __del__(self):
-	#	''' Destructor method - close database connection when object is no longer needed. '''
-	#	# if we had an open SQLite connection, close it
-	#	if self._db:
-	#		self._db.close()
+		:param dbconn: the connection to configure
+		:param read_only: set to ``True`` for connections opened with ``mode=ro``; settings that write to the database are skipped
+		'''
+		# set database-specific settings
+		#dbconn.isolation_level = None    # autocommit mode; transactions can be explicitly created with BEGIN/COMMIT statements
+		dbconn.row_factory = sqlite3.Row # return dictionaries instead of tuples from SELECT statements
 
-	#def _configure_db_connection(self, dbconn):
-	#	'''
-	#	Configure connection-level settings on the SQLite database.
-	#	'''
-	#	# set database-specific settings
-	#	#dbconn.isolation_level = None    # autocommit mode; transactions can be explicitly created with BEGIN/COMMIT statements
-	#	dbconn.row_factory = sqlite3.Row # return dictionaries instead of tuples from SELECT statements
+		# The journal mode (WAL) is stored in the database file and is set once in _initialize_database.
+		# These settings only apply to the connection and so must be set on each one.
+		if not read_only:
+			# with WAL, synchronous=NORMAL means a commit no longer waits on an fsync (the WAL is synced at checkpoints)
+			dbconn.execute("PRAGMA synchronous=NORMAL")
+		dbconn.execute("PRAGMA temp_store=MEMORY")
+		dbconn.execute("PRAGMA mmap_size=268435456") # 256 MB
+		dbconn.execute("PRAGMA cache_size=-20000")   # ~20 MB (negative values are in KiB)
+
+	def _database_version(self, connection:sqlite3.Connection) -> int:
+		'''
+		Returns the schema version of the database, or ``None`` if it doesn't have one (i.e. the schema hasn't been created).
+		'''
+		with contextlib.closing(connection.cursor()) as cursor:
+			if cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='metadata'").fetchone() is None:
+				return None
+			row = cursor.execute("SELECT database_version FROM metadata WHERE id=1").fetchone()
+		return None if row is None else row[0]
 
 	def _init_sqlite_db(self, connection:sqlite3.Connection):
 		'''
 		Initialize a new index database, e.g. create schema, initialize metadata.
+
+		This is safe to run on a database where another process is doing the same.
 		'''
 		with contextlib.closing(connection.cursor()) as cursor:
 
 			cursor.execute('''
-				CREATE TABLE metadata (
+				CREATE TABLE IF NOT EXISTS metadata (
 					id INTEGER PRIMARY KEY,
 					date_created DATE,
 					database_version INTEGER
 				);''')
 
-			cursor.execute(''' INSERT INTO metadata (id, date_created, database_version) VALUES (1, CURRENT_TIMESTAMP, 1); ''')
+			cursor.execute(''' INSERT OR IGNORE INTO metadata (id, date_created, database_version) VALUES (1, CURRENT_TIMESTAMP, ?); ''', (DATABASE_VERSION,))
 
-			# may just change this to "key","value" if this doesn't grow beyond a simple ket/value store
-			cursor.execute('''
-				CREATE TABLE cache (
-					id INTEGER PRIMARY KEY AUTOINCREMENT,
-					query TEXT UNIQUE,
-					json_response TEXT
-				);''')
+			self._create_cache_table(cursor)
+			connection.commit()
+
+	def _create_cache_table(self, cursor:sqlite3.Cursor):
+		'''
+		Create the table that stores the cached API responses.
+		'''
+		# may just change this to "key","value" if this doesn't grow beyond a simple ket/value store
+		# 'expires' is a Unix timestamp; NULL means the entry does not expire
+		# 'etag' and 'last_modified' are the HTTP validators returned with the response (if any)
+		# The query is the primary key of a WITHOUT ROWID table: the rows are stored in the primary key's
+		# B-tree, so a lookup is a single search with no separate index (or rowid) to go through.
+		cursor.execute('''
+			CREATE TABLE IF NOT EXISTS cache (
+				query TEXT PRIMARY KEY,
+				json_response TEXT,
+				expires REAL,
+				etag TEXT,
+				last_modified TEXT
+			) WITHOUT ROWID;''')
+
+	def _migrate_sqlite_db(self, connection:sqlite3.Connection, from_version:int):
+		'''
+		Bring a database created by an older version of this class up to the current schema.
 
-			cursor.execute('''CREATE UNIQUE INDEX query_idx ON cache(query)''');
+		The cache only contains responses that can be retrieved again, so rather than
+		migrating the rows the cache table is simply recreated.
+		'''
+		logger.debug(f"Upgrading local API cache from version {from_version} to {DATABASE_VERSION}.")
+		with contextlib.closing(connection.cursor()) as cursor:
+			cursor.execute("DROP TABLE IF EXISTS cache")
+			self._create_cache_table(cursor)
+			cursor.execute("UPDATE metadata SET database_version=? WHERE id=1", (DATABASE_VERSION,))
 			connection.commit()
 
 	def __getitem__(self, key):
 		'''
-		The cache is made to look like a key/value store.
+		The cache is made to look like a key/value store. Entries that have expired are treated as missing.
 		'''
+		return self._fresh_entry(key)["json_response"]
 
-		if not self.dbFilepath.exists():
-			logger.debug("no db file found")
+	def __setitem__(self, key, value):
+		'''
+		The cache is made to look like a key/value store. Values set this way do not expire.
+		'''
+		self.set(key, value)
 
-		# use URI method to supply connection options (here, read-only)
+	def _entry(self, key:str) -> dict:
+		'''
+		Returns the in-memory record for the key, reading it from the database if needed, or ``None``.
+		'''
+		with self._memory_lock:
+			entry = self._memory.get(key)
+			if entry is not None:
+				self._memory.move_to_end(key)
+				return entry
 
-		# this demonstrates a simple implementation: https://stackoverflow.com/a/47240886/2712652
-		with contextlib.closing(sqlite3.connect(f"file:{self.dbFilepath}?mode=ro", uri=True, timeout=30)) as connection:
-			with contextlib.closing(connection.cursor()) as cursor:
-				value = cursor.execute("SELECT json_response FROM cache WHERE query=?", (key,)).fetchone()
-				if value is None:
-					raise KeyError(key)
-				else:
-					return value[0]
+		row = self._with_recovery(lambda: self._read(_SQL_SELECT, (key,)))
+		if row is None:
+			return None
+		entry = dict(row)
+		self._remember(key, entry)
+		return entry
 
-	def __setitem__(self, key, value):
+	def _fresh_entry(self, key:str) -> dict:
 		'''
-		The cache is made to look like a key/value store.
+		As _entry(), but raises ``KeyError`` if the entry is missing or expired.
 		'''
+		entry = self._entry(key)
+		if entry is None:
+			raise KeyError(key)
+		expires = entry["expires"]
+		if expires is not None and expires <= time.time():
+			raise KeyError(key)
+		return entry
+
+	def _remember(self, key:str, entry:dict):
+		with self._memory_lock:
+			self._memory[key] = entry
+			self._memory.move_to_end(key)
+			while len(self._memory) > self.memory_cache_size:
+				self._memory.popitem(last=False)
 
-		# isolation_level=None puts the connection in autocommit mode
+	def _forget(self, key:str):
+		with self._memory_lock:
+			self._memory.pop(key, None)
+
+	def record(self, key:str) -> dict:
+		'''
+		Returns the full cache entry for the given key, including expired entries, or ``None`` if not present.
 
-		with contextlib.closing(sqlite3.connect(self.dbFilepath, isolation_level=None, timeout=30)) as connection:
-			with contextlib.closing(connection.cursor()) as cursor:
-				cursor.execute('pragma journal_mode=wal') # https://stackoverflow.com/questions/47250220/using-sqlite-with-wal
-				cursor.execute("REPLACE INTO cache (query, json_response) VALUES (?,?);", (key, value))
-				#connection.commit() # not needed when isolation_level=None
+		The returned dictionary has the keys ``json_response``, ``expires``, ``etag``, and ``last_modified``.
+		This is used to revalidate expired entries with the server rather than downloading them again.
+		The dictionary is a copy; modifying it doesn't change the cache.
+		'''
+		entry = self._entry(key)
+		return None if entry is None else dict(entry)
+
+	def parsedValue(self, key:str):
+		'''
+		Returns the value for the given key decoded from JSON; expired entries are treated as missing (raises ``KeyError``).
+
+		The JSON is parsed on each call (rather than keeping the decoded object), so the caller is free to modify the result.
+		'''
+		return json_loads(self._fresh_entry(key)["json_response"])
+
+	def set(self, key:str, value:str, ttl:float=None, etag:str=None, last_modified:str=None, background:bool=False):
+		'''
+		Store a value in the cache.
+
+		:param key: the key to store the value under, typically the API query
+		:param value: the value to store, typically the JSON response as a string
+		:param ttl: the number of seconds after which the entry expires; if ``None`` the entry does not expire
+		:param etag: the value of the ``ETag`` header of the response, if any
+		:param last_modified: the value of the ``Last-Modified`` header of the response, if any
+		:param background: if ``True``, return as soon as the value can be read from the cache (in memory) and write it to the database in a background thread; failures are then logged rather than raised
+		'''
+		expires = None if ttl is None else time.time() + ttl
+		self._forget(key)
+
+		row = (key, value, expires, etag, last_modified)
+		pending = getattr(self._local, "pending", None)
+		if pending is not None:
+			pending.append(row) # inside batch(); written when the batch ends
+			return
+
+		def write():
+			connection = self._connection()
+			with self._write_lock:
+				# the connection is in autocommit mode; no commit needed
+				connection.execute(_SQL_REPLACE, row)
+
+		if background:
+			def write_in_background():
+				try:
+					self._with_recovery(write)
+				except sqlite3.Error as e:
+					logger.debug(f"Unable to write to the local API cache: {e}")
+			self._remember_row(row) # readable right away
+			try:
+				_background_writer().submit(write_in_background)
+				return
+			except RuntimeError:
+				pass # the writer has been shut down (e.g. called from an atexit handler); write it here
+
+		self._with_recovery(write)
+		self._remember_row(row)
+
+	def _remember_row(self, row:tuple):
+		key, value, expires, etag, last_modified = row
+		self._remember(key, {"json_response":value, "expires":expires, "etag":etag, "last_modified":last_modified})
+
+	def setMany(self, items, ttl:float=None):
+		'''
+		Store several values in the cache in a single transaction.
+
+		This is much faster than setting the values one at a time since the database is only committed once.
+
+		:param items: an iterable of ``(key, value)`` pairs
+		:param ttl: the number of seconds after which the entries expire; if ``None`` the entries do not expire
+		'''
+		expires = None if ttl is None else time.time() + ttl
+		rows = [(key, value, expires, None, None) for key, value in items]
+		for row in rows:
+			self._forget(row[0])
+		self._write_rows(rows)
+
+	@contextlib.contextmanager
+	def batch(self):
+		'''
+		A context manager that collects all values set in the cache (from this thread) and writes them in a single transaction at the end.
+
+		Values set inside the block can't be read back from the cache until the block exits.
+
+		.. code-block:: python
+
+			with cache.batch():
+				for key, value in responses:
+					cache[key] = value
+		'''
+		if getattr(self._local, "pending", None) is not None:
+			yield # already in a batch; the outer one will write the values
+			return
+		self._local.pending = list()
+		try:
+			yield
+			rows = self._local.pending
+		finally:
+			self._local.pending = None
+		self._write_rows(rows)
+
+	def _write_rows(self, rows:list):
+		'''
+		Write rows of (query, json_response, expires, etag, last_modified) in one transaction.
+		'''
+		if len(rows) == 0:
+			return
+		def write():
+			connection = self._connection()
+			with self._write_lock:
+				# "IMMEDIATE" takes the write lock up front so the transaction can't fail part way on a busy database
+				connection.execute("BEGIN IMMEDIATE")
+				try:
+					connection.executemany(_SQL_REPLACE, rows)
+				except:
+					connection.execute("ROLLBACK")
+					raise
+				connection.execute("COMMIT")
+		self._with_recovery(write)
+		for row in rows:
+			self._remember_row(row)
+
+_background_writer_instance = None
+_background_writer_lock = threading.Lock()
+
+def _background_writer() -> concurrent.futures.ThreadPoolExecutor:
+	'''
+	Returns the single thread used for background writes to the API cache databases (see ``LocalAPICache.set``).
+
+	A single thread keeps the writes in order; pending writes are completed before the interpreter exits.
+	'''
+	global _background_writer_instance
+	with _background_writer_lock:
+		if _background_writer_instance is None:
+			_background_writer_instance = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="scidd-api-cache")
+			atexit.register(_background_writer_instance.shutdown) # waits for pending writes
+	return _background_writer_instance
+
+_default_caches_lock = threading.Lock()
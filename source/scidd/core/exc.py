@@ -29,3 +29,5 @@ class InternetConnectionError(Exception):
 class ErrorInAccessingAPI(Exception):
 	pass
 
+class IncompleteDownload(Exception):
+	pass
@@ -0,0 +1,35 @@
+
+import atexit
+from typing import Dict, List
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .version import __version__
+
+def create_session(pool_connections:int, pool_maxsize:int, headers:Dict[str,str]=None, status_forcelist:List[int]=None) -> requests.Session:
+	'''
+	Create an HTTP session with a pool of persistent connections and automatic retries.
+
+	All network access in this package goes through sessions created here so that the connection
+	pooling and retry policy are configured in one place.
+
+	:param pool_connections: the number of hosts to keep a connection pool for
+	:param pool_maxsize: the maximum number of connections kept open to a single host
+	:param headers: additional headers to send with every request
+	:param status_forcelist: HTTP status codes that should be retried
+	:returns: a new session
+	'''
+	session = requests.Session()
+	session.headers.update({"User-Agent" : f"scidd-core/{__version__}"})
+	if headers is not None:
+		session.headers.update(headers)
+	# (raise_on_status=False: once the retries are used up the last response is returned,
+	#  so callers see the HTTP error itself rather than urllib3's RetryError)
+	retry = Retry(total=3, backoff_factor=0.2, status_forcelist=status_forcelist, raise_on_status=False)
+	adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+	session.mount("http://", adapter)
+	session.mount("https://", adapter)
+	atexit.register(session.close) # release pooled connections cleanly at interpreter exit
+	return session
@@ -19,9 +19,10 @@ except NameError:
 	# default: coloredlogs.DEFAULT_LOG_FORMAT = '%(asctime)s %(hostname)s %(name)s[%(process)d] %(levelname)s %(message)s'
 	log_format = '[%(filename)s:%(lineno)d] %(name)s %(levelname)s %(message)s'
 
-	if colored_logs_available:
-		coloredlogs.install(logger=scidd_logger)
-
+	def _configure_logger():
+		'''
+		Install the colored log handler on the logger (a single call; each install replaces the handler).
+		'''
 		# Use in app as:
 		# logger = logging.getLogger('trillian-api')
 		# Log with: logger.info("log message")
@@ -38,42 +39,12 @@ except NameError:
 		#	'username': {'color': 'yellow'}
 		# }
 		#
-		field_styles = coloredlogs.DEFAULT_FIELD_STYLES
-		# default value = {'hostname': {'color': 'magenta'},
-		#				   'programname': {'color': 'cyan'},
-		#				   'name': {'color': 'blue'},
-		#                  'levelname': {'color': 'black', 'bold': True},
-		#				   'asctime': {'color': 'green'}
-		#                 }
-
-		# DEBUG
-		# -----
-		field_styles["levelname"] = {'color': 'yellow', 'bold': True}
-		field_styles["name"] = {'color': 'yellow', 'bold': True} # logger name
-		coloredlogs.install(level=logging.DEBUG, field_styles=field_styles, fmt=log_format, logger=scidd_logger)
-
-		# INFO
-		# ----
-		field_styles["levelname"] = {'color': 'yellow', 'bold': True}
-		field_styles["name"] = {'color': 'yellow', 'bold': True} # logger name
-		coloredlogs.install(level=logging.INFO, field_styles=field_styles, fmt=log_format, logger=scidd_logger)
-
-		# WARNING
-		# -------
-		field_styles["levelname"] = {'color': 'yellow', 'bold': True}
-		field_styles["name"] = {'color': 'yellow', 'bold': True} # logger name
-		coloredlogs.install(level=logging.WARNING, field_styles=field_styles, fmt=log_format, logger=scidd_logger)
-
-		# ERROR
-		# -----
-		field_styles["levelname"] = {'color': 'red', 'bold': False}
-		field_styles["name"] = {'color': 'yellow', 'bold': True} # logger name
-		coloredlogs.install(level=logging.ERROR, field_styles=field_styles, fmt=log_format, logger=scidd_logger)
-
-		# CRITICAL
-		# --------
+		field_styles = dict(coloredlogs.DEFAULT_FIELD_STYLES) # copy; don't modify the coloredlogs defaults
 		field_styles["levelname"] = {'color': 'red', 'bold': True}
 		field_styles["name"] = {'color': 'yellow', 'bold': True} # logger name
+
+		# Only critical messages are shown by default; lower with e.g. coloredlogs.set_level(logging.DEBUG)
 		coloredlogs.install(level=logging.CRITICAL, field_styles=field_styles, fmt=log_format, logger=scidd_logger)
 
-		#coloredlogs.set_level(logging.DEBUG)
+	if colored_logs_available:
+		_configure_logger()
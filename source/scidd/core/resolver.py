@@ -1,5 +1,6 @@
 
 
+import concurrent.futures
 from abc import ABC, abstractmethod
 
 class Resolver(ABC):
@@ -10,34 +11,61 @@ class Resolver(ABC):
 	The core SciDD package does not provide a resolver.
 	'''
 	_default_instance = None
+
+	# the maximum number of SciDDs resolved at the same time by urlsForSciDDs
+	max_concurrent_requests = 16
 	
 	def __init__(self, scheme:str='https', host:str=None, port:int=None):
-		self.scheme = scheme
-		self.host = host
-		self.port = port
-		self._base_url = None
+		self._scheme = scheme
+		self._host = host
+		self._port = port
+		self._update_base_url()
 				
 	def __repr__(self):
 		return "<{} object at {} '{}://{}:{}'>".format(self.__class__.__name__, hex(id(self)), self.scheme, self.host, self.port)
 
 	@property
-	def base_url(self):
+	def base_url(self) -> str:
 		'''
 		Returns the base URL (i.e. without a path) used to resolve SciDDs, e.g. ``https://apihost:port``.
 		'''
-		if self._base_url is None:
-			if self.port is None:
-				if self.scheme == "https":
-					port = 443
-				else:
-					port = 80
-					self._base_url = f"{scheme}://{self.host}"
-			else:
-				if (self.scheme == "https" and self.port == 443) or (self.scheme == "http" and self.port == 80):
-					self._base_url = f"{self.scheme}://{self.host}"
-				else:
-					self._base_url = f"{self.scheme}://{self.host}:{self.port}"
+		# built once and updated when the scheme, host, or port change since it's used for every SciDD resolved
 		return self._base_url
+
+	def _update_base_url(self):
+		port = self._port if self._port else (443 if self._scheme == "https" else 80)
+		default_port = (self._scheme == "https" and port == 443) or (self._scheme == "http" and port == 80)
+		if default_port:
+			self._base_url = f"{self._scheme}://{self._host}"
+		else:
+			self._base_url = f"{self._scheme}://{self._host}:{port}"
+
+	@property
+	def scheme(self) -> str:
+		return self._scheme
+
+	@scheme.setter
+	def scheme(self, new_scheme:str):
+		self._scheme = new_scheme
+		self._update_base_url()
+
+	@property
+	def host(self) -> str:
+		return self._host
+
+	@host.setter
+	def host(self, new_host:str):
+		self._host = new_host
+		self._update_base_url()
+
+	@property
+	def port(self) -> int:
+		return self._port
+
+	@port.setter
+	def port(self, new_port:int):
+		self._port = new_port
+		self._update_base_url()
 		
 	@classmethod
 	def default_resolver(cls):
@@ -55,6 +83,22 @@ class Resolver(ABC):
 		'''
 		pass # subclass to implement
 				
+	def urlsForSciDDs(self, scidds:list) -> dict:
+		'''
+		Resolve several SciDDs into URLs at once.
+
+		This implementation calls :py:meth:`urlForSciDD` for each one, up to :py:attr:`max_concurrent_requests`
+		at the same time so that the round trips to a resolving service overlap (``urlForSciDD`` must be thread safe);
+		subclasses backed by a service that has a batch endpoint should override it so that a single request resolves the whole list.
+
+		:param scidds: a list of SciDD objects
+		:returns: a dictionary with the SciDD strings as keys and URLs as values
+		'''
+		if len(scidds) < 2 or self.max_concurrent_requests < 2:
+			return {str(s):self.urlForSciDD(s) for s in scidds}
+		with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_concurrent_requests, len(scidds))) as executor:
+			return dict(zip([str(s) for s in scidds], executor.map(self.urlForSciDD, scidds)))
+
 	@abstractmethod
 	def resourceForID(self, scidd):
 		'''
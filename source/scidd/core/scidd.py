@@ -3,51 +3,225 @@ from __future__ import annotations # remove in Python 4.0
 # Needed for forward references, see:
 # https://stackoverflow.com/a/33533514/2712652
 
-import io
 import os
 import re
-import sys
+import errno
 import bz2
-import pdb
-import gzip
-import time
+import zlib
+import queue
+import contextlib
 import shutil
-import urllib
+import email.utils
+import tempfile
+import urllib.parse
 import pathlib
-from typing import Union
-from zipfile import ZipFile
-from abc import ABC, abstractproperty, abstractmethod
+import importlib
+import collections
+import threading
+import concurrent.futures
+from typing import Union, TYPE_CHECKING
 
-import astropy
 import requests
+from urllib3.exceptions import ProtocolError
 
-import scidd
 from . import exc
 from .cache import SciDDCacheManager, SciDDCacheManagerBase
 from .resolver import Resolver
+from .http import create_session
 from .logger import scidd_logger as logger
 
+try:
+	# ISA-L's inflate is a drop-in for zlib's and two to three times faster
+	from isal import isal_zlib as _gzip_zlib
+except ImportError:
+	_gzip_zlib = zlib
+
+if TYPE_CHECKING:
+	import astropy.units # annotations only; astropy is slow to import
+
 # list of file extensions that we treat as compressed files
 COMPRESSED_DOT_FILE_EXTENSIONS = [".gz", ".bz2", ".zip"]
+_COMPRESSED_DOT_FILE_EXTENSIONS_TUPLE = tuple(COMPRESSED_DOT_FILE_EXTENSIONS) # for str.endswith()
+
+# buffer size used when streaming (and decompressing) downloads to disk
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+# zip archives up to this size are held in memory while being extracted
+_ZIP_SPOOL_SIZE = 64 * 1024 * 1024
+
+def _temporary_path(destination:pathlib.Path) -> pathlib.Path:
+	'''
+	Returns a name in the same directory as ``destination`` to write a download to before it's moved into place.
 
-def set_file_time_to_last_modified(filepath, response):
+	The name is unique to this process and thread so that concurrent downloads of the same file don't write over each other.
+	'''
+	return destination.with_name(f".{destination.name}.{os.getpid()}-{threading.get_ident()}.part")
+
+def _remove(filepath:pathlib.Path):
+	'''
+	Delete a file if it exists.
+	'''
+	try:
+		os.unlink(filepath)
+	except FileNotFoundError:
+		pass
+
+@contextlib.contextmanager
+def _writing_file(destination:pathlib.Path):
+	'''
+	Context manager for writing a file under a temporary name, moving it to ``destination`` only when the block completes.
+
+	A download that fails part way through then never leaves a partial file where it would be taken as cached.
+
+	:param destination: the full path of the file to write
+	:returns: the temporary path to write to
+	'''
+	temporary = _temporary_path(destination)
+	try:
+		yield temporary
+	except BaseException:
+		_remove(temporary)
+		raise
+	os.replace(temporary, destination)
+
+def _preallocate(fd:int, size:int):
+	'''
+	Reserve space on disk for a file about to be written (where supported), which avoids fragmentation and fails early if the disk is full.
+	'''
+	if hasattr(os, "posix_fallocate"):
+		try:
+			os.posix_fallocate(fd, 0, size)
+			return
+		except OSError as e:
+			if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+				raise # e.g. ENOSPC, the disk is full
+			# not supported by the file system; fall through
+	os.ftruncate(fd, size)
+
+def _decompress_stream(source, new_decompressor, f):
+	'''
+	Decompress a stream into an open file, reading the next chunk from the network in a separate thread while the current one is decompressed.
+
+	:param source: the file-like object to read the compressed data from, e.g. ``response.raw``
+	:param new_decompressor: a callable returning a new decompressor object (e.g. ``bz2.BZ2Decompressor``); called again for each concatenated stream
+	:param f: the file object to write the decompressed data to
+	'''
+	chunks = queue.Queue(maxsize=8)
+	done = threading.Event() # set if the consumer stops early so the reader doesn't block forever
+	failure = list()
+
+	def put(chunk:bytes) -> bool:
+		# returns False (without adding the chunk) if the consumer has stopped
+		while not done.is_set():
+			try:
+				chunks.put(chunk, timeout=0.1)
+				return True
+			except queue.Full:
+				pass
+		return False
+
+	def read_chunks():
+		try:
+			while True:
+				chunk = source.read(_COPY_BUFFER_SIZE)
+				if not put(chunk) or not chunk:
+					break
+		except Exception as e:
+			failure.append(e)
+			put(b"") # wake the consumer (unless it has already stopped)
+
+	reader = threading.Thread(target=read_chunks, daemon=True)
+	reader.start()
+	try:
+		decompressor = new_decompressor()
+		in_stream = False # True when part of a compressed stream has been read but not its end
+		while True:
+			data = chunks.get()
+			if not data:
+				break
+			while data:
+				in_stream = True
+				f.write(decompressor.decompress(data))
+				if not decompressor.eof:
+					break
+				# the end of one compressed stream; any remaining data is the start of the next
+				in_stream = False
+				data = decompressor.unused_data
+				decompressor = new_decompressor()
+		if failure:
+			raise failure[0]
+		if in_stream:
+			raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+	finally:
+		done.set()
+		reader.join()
+
+# every SciDD starts with this; the top level domain follows it, e.g. "scidd:/astro/..."
+_SCIDD_PREFIX = "scidd:/"
+_SCIDD_PREFIX_LENGTH = len(_SCIDD_PREFIX)
+
+# the components of a SciDD: path, ";" path parameters, "?" query, "#" fragment
+_SCIDD_COMPONENTS_RE = re.compile(r"scidd:/([^;?#]+)(;[^?#\s]+)?(\?[^#\s]+)?(#.+)?")
+
+# SciDD subclasses dedicated to a top level domain: domain -> (module, class, class for files).
+# The modules are imported the first time a SciDD in that domain is created.
+_DOMAIN_CLASS_NAMES = {
+	"astro" : ("scidd.astro", "SciDDAstro", "SciDDAstroFile")
+}
+_domain_classes = dict() # domain -> (class, class for files), filled in by _classes_for_domain
+
+def _classes_for_domain(domain:str) -> tuple:
+	'''
+	Returns the SciDD subclasses ``(class, class for files)`` for the given top level domain, or ``None`` if there are none.
+	'''
+	classes = _domain_classes.get(domain)
+	if classes is None:
+		names = _DOMAIN_CLASS_NAMES.get(domain)
+		if names is None:
+			return None
+		module = importlib.import_module(names[0])
+		classes = (getattr(module, names[1]), getattr(module, names[2]))
+		_domain_classes[domain] = classes
+	return classes
+
+# URLs of files found on the server only in compressed form: url -> extension (see SciDDFileResource._find_compressed_extension)
+_compressed_extensions = collections.OrderedDict()
+_compressed_extensions_lock = threading.Lock()
+_COMPRESSED_EXTENSIONS_CACHE_SIZE = 4096
+
+def set_file_time_to_last_modified(filepath, response, f=None):
 	'''
 	If the 'Last-Modified' header is found in the response, update the downloaded file's timestamp to that date.
+
+	:param filepath: the path of the downloaded file
+	:param response: the response the file was downloaded from
+	:param f: the file object if still open for writing; the time is then set on the open file rather than looking up the path again
 	'''
+	last_modified = response.headers.get("Last-Modified")
+	if not last_modified:
+		return # "Last-Modified" header not present
 	try:
-		srvLastModified = time.mktime(time.strptime(response.headers["Last-Modified"], "%a, %d %b %Y %H:%M:%S GMT"))
+		srvLastModified = email.utils.parsedate_to_datetime(last_modified).timestamp()
+	except (TypeError, ValueError):
+		return # not a valid HTTP date
+	if f is not None and os.utime in os.supports_fd:
+		f.flush() # writing buffered data later would update the time again
+		os.utime(f.fileno(), (srvLastModified, srvLastModified))
+	else:
 		os.utime(filepath, (srvLastModified, srvLastModified))
-	except KeyError:
-		# "Last-Modified" header not present
-		pass
 
 
 class SciDD(): #, metaclass=SciDDMetaclass):
 	'''
 	This class is wrapper around SciDD identifiers.
 
+	Instance attributes are declared in ``__slots__`` to keep the objects small when many are created.
+	Subclasses that don't declare ``__slots__`` themselves get an instance ``__dict__`` as usual.
+
 	:param sci_dd: the SciDD identifier
 	'''
+	__slots__ = ("_scidd", "_path", "_fragment", "resolver", "_url", "__weakref__")
+
 	def __init__(self, sci_dd:str=None, resolver=None):
 		if sci_dd is None:
 			raise ValueError("An identifier must be provided.")
@@ -58,8 +232,16 @@ class SciDD(): #, metaclass=SciDDMetaclass):
 		self._url = None # a place to cache a URL once the record has been resolved
 
 		# note: only minimal validation is being performed
-		if self.isValid() is False:
-			raise ValueError(f"The provided identifier was not validated as a valid SciDD ('sci_dd').")
+		if type(self).isValid is SciDD.isValid:
+			# the base class check, inlined since it's run for every object created;
+			# done before parsing, which requires a string
+			if not (isinstance(sci_dd, str) and sci_dd.startswith(_SCIDD_PREFIX)):
+				raise ValueError(f"The provided identifier was not validated as a valid SciDD ('sci_dd').")
+			self._parse()
+		else:
+			self._parse() # a subclass that performs its own validation may use the parsed components
+			if self.isValid() is False:
+				raise ValueError(f"The provided identifier was not validated as a valid SciDD ('sci_dd').")
 
 		# set the resolver
 		# if resolver is None:
@@ -77,13 +259,14 @@ class SciDD(): #, metaclass=SciDDMetaclass):
 		# It may not work for string values?
 
 		# Useful ref: https://stackoverflow.com/a/5953974/2712652
-		if type(cls) == type(SciDD):
-			if str(sci_dd).startswith("scidd:/astro"):
-				from scidd.astro import SciDDAstro, SciDDAstroFile
-				if "/file/" in str(sci_dd):
-					return SciDDAstroFile.__new__(SciDDAstroFile, sci_dd=sci_dd, resolver=resolver)
-				else:
-					return SciDDAstro.__new__(SciDDAstro, sci_dd=sci_dd, resolver=resolver)
+		s = sci_dd if isinstance(sci_dd, str) else str(sci_dd)
+		if s.startswith(_SCIDD_PREFIX):
+			end = s.find("/", _SCIDD_PREFIX_LENGTH)
+			classes = _classes_for_domain(s[_SCIDD_PREFIX_LENGTH:end] if end != -1 else s[_SCIDD_PREFIX_LENGTH:])
+			if classes is not None:
+				subclass = classes[1] if s.find("/file/", _SCIDD_PREFIX_LENGTH) != -1 else classes[0]
+				if subclass is not cls and issubclass(subclass, cls):
+					return subclass.__new__(subclass, sci_dd=sci_dd, resolver=resolver)
 			# if sci_dd.startswith("scidd:/astro/data/"):
 			# 	return super().__new__(scidd.astro.SciDDAstroData)
 			# elif sci_dd.startswith("scidd:/astro/file/"):
@@ -107,6 +290,30 @@ class SciDD(): #, metaclass=SciDDMetaclass):
 		if not isinstance(new_id, str):
 			raise ValueError("The 'scidd' property must be a string.")
 		self._scidd = new_id
+		self._parse()
+
+	def _parse(self):
+		'''
+		Split the identifier into the components returned by :py:attr:`path` and :py:attr:`fragment`.
+
+		This is done once when the identifier is set rather than on every access.
+		'''
+		# SciDD is [schema]:[path];[path parameters]?[query component]#[fragment]
+		s = self._scidd
+
+		# Check the optional components are present; remove them if so.
+		# Since these are special characters in URNs, if they appear as values
+		# they would have to be URL-encoded, so it's safe to split on them.
+		i = s.find("#")
+		if i == -1:
+			self._fragment = None
+		else:
+			self._fragment = s[i+1:].split("#")[0]
+			s = s[:i]
+
+		s = s.replace('scidd:/', '')
+		s = s.split("?")[0] # remove query
+		self._path = s.split(";")[0] # remove path parameters
 
 	def isValid(self) -> bool:
 		'''
@@ -118,7 +325,7 @@ class SciDD(): #, metaclass=SciDDMetaclass):
 		:returns: ``True`` if this generally looks like an identifier, ``False`` if not
 		'''
 		# sometimes it might be beneficial for overriding classes to call super, other times it's inefficient and redundant.
-		return self.scidd.startswith("scidd:/")
+		return self._scidd.startswith(_SCIDD_PREFIX)
 
 	def isFile(self) -> bool:
 		# note: this may not be an easily determined property, but let's assume for now it is
@@ -143,6 +350,35 @@ class SciDD(): #, metaclass=SciDDMetaclass):
 	def url(self, new_value):
 		self._url = new_value
 
+	@classmethod
+	def prefetchURLs(cls, scidds:list, resolver:Resolver=None, batch_size:int=25):
+		'''
+		Resolve the URLs of many SciDDs in batches instead of one request per SciDD.
+
+		The URLs are stored on each object, so accessing :py:attr:`url` afterwards does not contact the resolver.
+		SciDDs that already have a URL are skipped.
+
+		:param scidds: a list of SciDD objects
+		:param resolver: the resolver to use; defaults to the resolver of each SciDD
+		:param batch_size: the maximum number of SciDDs resolved per request (services typically limit this, e.g. to 25)
+		'''
+		# group by resolver so each batch goes to a single service
+		unresolved = dict()
+		for s in scidds:
+			if s._url is not None:
+				continue
+			r = resolver or s.resolver
+			if r is None:
+				raise exc.NoResolverAssignedException("Attempting to resolve a SciDD without having first set a resolver object.")
+			unresolved.setdefault(r, list()).append(s)
+
+		for r, group in unresolved.items():
+			for i in range(0, len(group), batch_size):
+				batch = group[i:i+batch_size]
+				urls = r.urlsForSciDDs(batch)
+				for s in batch:
+					s._url = urls[s.scidd]
+
 	@property
 	def path(self) -> str:
 		'''
@@ -151,30 +387,7 @@ class SciDD(): #, metaclass=SciDDMetaclass):
 		This is the component after the schema ("scidd") and excludes the path parameters,
 		query component, and fragment, each of which are optional.
 		'''
-		# SciDD is [schema]:[path];[path parameters]?[query component]
-		#
-		re_matched = False
-		s = str(self).replace('scidd:/', '')
-
-		# Check the optional components are present; remove them if so.
-		# Since these are special characters in URNs, if they appear as values
-		# they would have to be URL-encoded, so it's safe to split on them.
-
-		# remove fragment
-		if "#" in s:
-			s = s.split("#")[0]
-
-		# remove query
-		if "?" in s:
-			s = s.split("?")[0]
-
-		# remove path parameters
-		if ";" in s:
-			s = s.split(";")[0]
-
-		return s
-
-		#return str(self).replace('scidd:', '')
+		return self._path
 
 	def pathParameters(self, field:str=None) -> str:
 		'''
@@ -188,7 +401,7 @@ class SciDD(): #, metaclass=SciDDMetaclass):
 
 		:param field: if present, only return the value for the requested field
 		'''
-		match = re.search(r"scidd:/([^;?#]+)(;[^?#\s]+)?(\?[^#\s]+)?(#.+)?", str(self))
+		match = _SCIDD_COMPONENTS_RE.search(self._scidd)
 		if match:
 			#logger.debug(f"found {match.groups()}")
 			path_params = match.group(2)
@@ -209,20 +422,15 @@ class SciDD(): #, metaclass=SciDDMetaclass):
 		'''
 		The fragment part of the SciDD; this component of the string identifies data within the resource.
 		'''
-		if "#" in self._scidd:
-			return self._scidd.split("#")[1]
-		else:
-			return None
+		return self._fragment
 
 	@fragment.setter
 	def fragment(self, new_fragment):
 		'''
 		Add the provided string as a fragment to this SciDD.
 		'''
-		if "#" in self._scidd:
-			# already has a fragment
-			self._scidd = self._scidd.sciDDWithoutFragment()
-		self._scidd = "#".join(self._scidd, new_fragment)
+		scidd_without_fragment = self._scidd.split("#")[0] # remove any existing fragment
+		self.scidd = f"{scidd_without_fragment}#{new_fragment}"
 
 	def sciDDWithoutFragment(self) -> SciDD:
 		'''
@@ -248,14 +456,39 @@ class SciDD(): #, metaclass=SciDDMetaclass):
 		'''
 		if filename is None or len(filename) == 0:
 			raise ValueError("A filename must be provided.")
-		if domain == "astro":
-			from scidd.astro import SciDDAstroFile
-			#return SciDDAstroFile.__new__(SciDDAstro, sci_dd=sci_dd, resolver=resolver)
+		classes = _classes_for_domain(domain)
+		if classes is not None:
 			# .. todo: check here if the path looks like a file in the first place
-			return SciDDAstroFile.fromFilename(filename=filename, allow_multiple_results=allow_multiple_results)
+			return classes[1].fromFilename(filename=filename, allow_multiple_results=allow_multiple_results)
 		else:
 			raise NotImplementedError(f"The top level domain '{domain}' is not currently implemented (the only domain currently implemented is 'astro'.")
 
+	@classmethod
+	def fromFilenames(cls, domain:str, filenames:list, allow_multiple_results=False, max_workers:int=16) -> list:
+		'''
+		Returns SciDD identifiers for many filenames; see :py:meth:`fromFilename`.
+
+		Each filename normally takes a round trip to a resolving service; if the domain class provides
+		a ``fromFilenames`` method (e.g. one that sends a single batch request) it is used, otherwise
+		the filenames are resolved concurrently, sharing the API's connection pool.
+
+		:param domain: the top level domain of the resources, e.g. ``astro``
+		:param filenames: a list of filenames to create SciDD identifiers from
+		:param allow_multiple_results: see :py:meth:`fromFilename`
+		:param max_workers: the maximum number of filenames resolved at the same time
+		:returns: a list of results in the same order as ``filenames``
+		'''
+		if any(filename is None or len(filename) == 0 for filename in filenames):
+			raise ValueError("A filename must be provided.")
+		classes = _classes_for_domain(domain)
+		if classes is None:
+			raise NotImplementedError(f"The top level domain '{domain}' is not currently implemented (the only domain currently implemented is 'astro'.")
+		file_class = classes[1]
+		if file_class.fromFilenames.__func__ is not SciDD.fromFilenames.__func__: # the domain provides its own batch resolution
+			return file_class.fromFilenames(filenames=filenames, allow_multiple_results=allow_multiple_results)
+		with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+			return list(executor.map(lambda filename: file_class.fromFilename(filename=filename, allow_multiple_results=allow_multiple_results), filenames))
+
 class SciDDFileResource:
 	'''
 	This class represents a :class:`SciDD` identifier that specifically points to and helps manage a file resource.
@@ -268,7 +501,24 @@ class SciDDFileResource:
 	# Use this cache manager for all new SciDDs (that point to files, of course).
 	# Note that this is a class variable! Changing it will not change any
 	# previously set cache manager on existing SciDDFileResource objects.
-	_default_cache_manager = SciDDCacheManager.defaultCache()
+	# If None, SciDDCacheManager.defaultCache() is used; it's looked up on first use (see the 'cache' property).
+	_default_cache_manager = None
+
+	# HTTP session (and connection pool) shared by all downloads
+	_session = create_session(pool_connections=16, pool_maxsize=64)
+
+	# Large files are downloaded over several connections in parallel (using HTTP range requests)
+	# when the server supports it. Set the number of connections to 1 to disable this.
+	parallel_download_connections = 4 # capped at 8
+	parallel_download_min_size = 16 * 1024 * 1024 # in bytes
+
+	# compressed file extension -> name of the method that downloads and decompresses it
+	_decompressing_downloaders = {
+		".gz" : "_download_gz_file",
+		".bz2" : "_download_bz2_file",
+		".bzip2" : "_download_bz2_file",
+		".zip" : "_download_zip_file"
+	}
 
 	def __init__(self):
 		self._filepath = None # store local location
@@ -278,21 +528,11 @@ class SciDDFileResource:
 		# .. todo:: this doesn't seem to be used anywhere.
 		#self._filename_unique_identifier = None # a string used to disambiguate files with the same name in the same dataset release
 
-		if __class__._default_cache_manager is None:
-			self.cache = SciDDCacheManager.defaultCache()
-		else:
-			self.cache = __class__._default_cache_manager
+		self._cache = None # the cache manager; resolved on first use (see the 'cache' property)
 
 		# information retrieved from the Trillian API, used to test successful download of file, todo: can also use hash but will be slower
 		self._uncompressed_file_size = None
 
-		# Caches
-		# A SciDD is an "abstract" representation of the data. A file (in this case) can be located
-		# in multiple caches managed by the same program. The dictionary below stores the path
-		# location within each cache it encounters (i.e. relative to the top level of the cache).
-		# The value is not calculated here.
-		self._path_within_cache = dict() # key=cache manager obj, value=path; save value per cache object for repeated lookups
-
 	# @property
 	# def filename_without_compression_extension(self):
 	# 	'''
@@ -304,6 +544,24 @@ class SciDDFileResource:
 	# 			return filename[:-len(ext)]
 	# 	return filename
 
+	@property
+	def cache(self) -> SciDDCacheManagerBase:
+		'''
+		The cache manager that this file is downloaded to and looked for in.
+
+		Unless set, this is the class' default cache manager (or ``SciDDCacheManager.defaultCache()`` if there isn't one).
+		'''
+		if self._cache is None:
+			if __class__._default_cache_manager is None:
+				self._cache = SciDDCacheManager.defaultCache()
+			else:
+				self._cache = __class__._default_cache_manager
+		return self._cache
+
+	@cache.setter
+	def cache(self, new_cache:SciDDCacheManagerBase):
+		self._cache = new_cache
+
 	@property
 	def filename(self) -> str:
 		'''
@@ -321,9 +579,7 @@ class SciDDFileResource:
 		Removing both and returning the final path component yields the filename.
 		'''
 		if self._filename is None:
-			path = self.path # remove scheme
-			path = path.split(";")[0] # remove scheme-specific segment
-			self._filename = os.path.basename(path)
+			self._filename = os.path.basename(self.path) # the path has no scheme, path parameters, query, or fragment
 		return self._filename
 
 	@filename.setter
@@ -344,48 +600,104 @@ class SciDDFileResource:
 		on a SciDD object will cause the associated file to be downloaded if it's not found on disk.
 		'''
 		if self._filepath is None:
-			# already in cache?
-			expected_filepath = self.cache.path / self.pathWithinCache() / self.filename
-			if expected_filepath.exists():
-				self._filepath = expected_filepath
-				#logger.debug(f'Found in cache: "{expected_filepath}"')
+			# already in cache? (sets self._filepath if so)
+			if self.isInCache():
+				#logger.debug(f'Found in cache: "{self._filepath}"')
 				return self._filepath
+			expected_filepath = self.cache.path / self.pathWithinCache() / self.filename
 			# File was not found. If a compressed version exists, use that.
-			# If not, download the file.
+			# If not, download the file. (There's no need to look if the filename is already that of a compressed file.)
 			#
-			for ext in COMPRESSED_DOT_FILE_EXTENSIONS:
-				path = expected_filepath.parent / f"{expected_filepath.name}{ext}"
-				logger.debug(f"checking: {path}")
-				if path.exists():
-					self._filepath = path
-					return self._filepath
+			if not expected_filepath.name.lower().endswith(_COMPRESSED_DOT_FILE_EXTENSIONS_TUPLE):
+				for ext in COMPRESSED_DOT_FILE_EXTENSIONS:
+					path = expected_filepath.parent / f"{expected_filepath.name}{ext}"
+					logger.debug(f"checking: {path}")
+					if path.exists():
+						self._filepath = path
+						return self._filepath
 
 			# Not found; download the file.
 			#logger.debug(f" -----> {self.cache.path / self.pathWithinCache}")
-			expected_filepath = self.downloadTo(path=expected_filepath.parent) #self.cache.path / self.pathWithinCache)
-
-			# double check
-			if expected_filepath.exists():
-				self._filepath = expected_filepath
-			else:
-				raise NotImplementedError(f"Expected to find file at '{expected_filepath}, but not found (self.filename={self.filename}).'")
+			# downloadTo raises an exception if the file could not be written, so there's no need to check it's there
+			self._filepath = self.downloadTo(path=expected_filepath.parent) #self.cache.path / self.pathWithinCache)
 
 		return self._filepath
 
+	@classmethod
+	def prefetchCachePresence(cls, scidds:list):
+		'''
+		Look for the files of many SciDDs in their caches at once, setting :py:attr:`filepath` for those found.
+
+		Checking each file individually takes up to four ``stat`` calls (the file and its compressed variants);
+		this instead lists each cache directory once, which is much faster when importing many files.
+		Files that are not found are left alone (they will be downloaded when :py:attr:`filepath` is accessed);
+		as in :py:meth:`isInCache`, zero-length files (e.g. from an interrupted download) are treated as not found.
+
+		:param scidds: a list of SciDD file resource objects
+		'''
+		# group by directory so each is listed once
+		directories = dict()
+		for s in scidds:
+			if s._filepath is None:
+				directory = os.path.join(s.cache.path, s.pathWithinCache()) # a string: cheaper to build and hash than a Path
+				directories.setdefault(directory, list()).append(s)
+
+		for directory, group in directories.items():
+			try:
+				with os.scandir(directory) as entries:
+					entries = {entry.name:entry for entry in entries}
+			except FileNotFoundError:
+				continue # nothing cached here yet
+			for s in group:
+				# same order as in filepath: the file itself, then compressed versions
+				for name in [s.filename] + [f"{s.filename}{ext}" for ext in COMPRESSED_DOT_FILE_EXTENSIONS]:
+					entry = entries.get(name)
+					# (only files that match are stat'ed)
+					if entry is not None and entry.stat().st_size > 0:
+						s._filepath = pathlib.Path(directory, name)
+						break
+
+	@classmethod
+	def downloadMany(cls, scidds:list, max_workers:int=16, max_per_host:int=None) -> list:
+		'''
+		Make sure the files of many SciDDs are available locally, downloading those not already in the cache concurrently.
+
+		Downloading one file after another leaves most of the available bandwidth unused; this keeps up to
+		``max_workers`` downloads in flight, sharing the download connection pool.
+
+		:param scidds: a list of SciDD file resource objects
+		:param max_workers: the maximum number of files to download at the same time
+		:param max_per_host: if set, the maximum number of files downloaded from any one server at the same time
+		:returns: a list of the local paths of the files in the same order as ``scidds``
+		'''
+		cls.prefetchCachePresence(scidds) # files already cached don't need a worker
+
+		host_limits = dict() # host -> semaphore
+
+		def download(s):
+			if max_per_host is None or s._filepath is not None:
+				return s.filepath
+			host = urllib.parse.urlparse(s.url).hostname
+			with host_limits.setdefault(host, threading.BoundedSemaphore(max_per_host)):
+				return s.filepath
+
+		with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+			return list(executor.map(download, scidds))
+
 	@property
 	def fileExtension(self) -> str:
 		'''
 		Return the file extension, if there is one.
 		'''
-		return os.splitext(self.filename)[1]
+		return os.path.splitext(self.filename)[1].lower()
 
 	def pathWithinCache(self, cache:SciDDCacheManagerBase=None) -> pathlib.Path:
 		'''
 		Returns the subpath within the cache where this resource should be placed/found for the given cache manager.
 
 		A SciDD is an "abstract" representation of the data. A file (in this case) can be located
-		in multiple caches managed by the same program. The dictionary below stores the path
-		location within each cache it encounters (i.e. relative to the top level of the cache).
+		in multiple caches managed by the same program. The path returned is relative to the top level
+		of the given cache; cache managers are responsible for memoizing it if it's expensive to compute.
 
 		Usually the default cache manager is the right choice and the parameter can be omitted.
 
@@ -393,13 +705,9 @@ class SciDDFileResource:
 		'''
 		if cache is None:
 			cache = self.cache
-		try:
-			return self._path_within_cache[cache]
-		except KeyError:
-			path = cache.pathWithinCache(sci_dd=self)
-			self._path_within_cache[cache] = path
-			assert not str(path).startswith("/"), "This causes problems when joining paths."
-			return path
+		path = cache.pathWithinCache(sci_dd=self)
+		assert not str(path).startswith("/"), "This causes problems when joining paths."
+		return path
 
 	def isInCache(self) -> bool:
 		'''
@@ -409,15 +717,22 @@ class SciDDFileResource:
 		In this case, the file will be deleted and ``False`` will be returned.
 		'''
 		# If the file is found, sets self._filepath if not already set.
-		full_path = self.cache.path / self.pathWithinCache() / self.filename
-		if full_path.exists():
-			if full_path.stat().st_size == 0:
-				# possible error in earlier run
-				full_path.unlink(missing_ok=True) # delete zero length file (won't be missing here!)
-				return False
-			return True
-		else:
+		# (The path is built as a string; a Path object is only created when the file is found.)
+		full_path = os.path.join(self.cache.path, self.pathWithinCache(), self.filename)
+		try:
+			size = os.stat(full_path).st_size # a single stat call answers both "exists?" and "is empty?"
+		except FileNotFoundError:
+			return False
+		if size == 0:
+			# possible error in earlier run
+			try:
+				os.unlink(full_path) # delete zero length file
+			except FileNotFoundError:
+				pass
 			return False
+		if self._filepath is None:
+			self._filepath = pathlib.Path(full_path)
+		return True
 
 	@property
 	def uncompressedSize(self) -> astropy.units.quantity.Quantity:
@@ -444,13 +759,21 @@ class SciDDFileResource:
 		logger.debug(f"downloading '{self.url}' to: '{path}'")
 		#raise Exception("break here to catch when files are being downloaded")
 
+		cache_directory = self.cache.path / self.pathWithinCache() # computed once; used below
 		if path is None:
-			path = self.cache.path / self.pathWithinCache()
+			path = cache_directory
 		elif isinstance(path, str):
 			path = pathlib.Path(path)
 
-		if self.isInCache(): # checks for zero length file; if found, deletes and returns False
-			return self.filepath
+		# already in the cache? (same check as isInCache(): a zero length file is left from an earlier error and is deleted)
+		target = cache_directory / self.filename
+		try:
+			if target.stat().st_size > 0:
+				self._filepath = target
+				return target
+			target.unlink(missing_ok=True)
+		except FileNotFoundError:
+			pass
 
 		if os.path.lexists(path):
 			# 'lexists' returns True for broken symbolic links;
@@ -460,16 +783,15 @@ class SciDDFileResource:
 			if path.exists() is False:
 				raise Exception(f"Tried to set up a cache directory but found what appears to be a broken symbolic link: '{path}'")
 		else:
-			path.mkdir(parents=True)
+			path.mkdir(parents=True, exist_ok=True) # another thread may be creating it too (see downloadMany)
 
 		url = self.url
-		ext = os.path.splitext(url)[1].lower() # file extension
-
-		target_file_is_compressed = ext in COMPRESSED_DOT_FILE_EXTENSIONS
+		target_file_is_compressed = url.lower().endswith(_COMPRESSED_DOT_FILE_EXTENSIONS_TUPLE)
 
 		if target_file_is_compressed and self.cache.decompressDownloads:
+			ext = url[url.rfind("."):].lower() # file extension; known to be one of COMPRESSED_DOT_FILE_EXTENSIONS
 			self._filepath = self._download_compressed_file(url=url, ext=ext, path=path) # <- decompresses file
-			self._filename = p.name
+			self._filename = self._filepath.name
 			return self.filepath
 
 		#status = None
@@ -477,8 +799,8 @@ class SciDDFileResource:
 		# Rather than read the whole thing into memory,
 		# stream the data straight to a file on disk (making sure there are no errors).
 		try:
-			response = requests.get(url, stream=True) # make connection to remote server
-			destination_file = self.cache.path / self.pathWithinCache() / os.path.basename(url) #self.filename
+			response = self._session.get(url, stream=True) # make connection to remote server
+			destination_file = path / os.path.basename(url) #self.filename
 			logger.debug(f"A destination_file='{destination_file}'")
 		except requests.exceptions.ConnectionError as err:
 			if "HTTPSConnectionPool" in str(err):
@@ -497,45 +819,72 @@ class SciDDFileResource:
 				logger.debug(f"404 File not found (url='{url}')")
 
 				# File was not found. Try again with common file compression suffixes?
-				file_found = False
-				for ext in COMPRESSED_DOT_FILE_EXTENSIONS:
-					# where are you mr file?
-					if requests.head(url+ext).status_code == 200: # found file
-						url = url + ext
-						file_found = True
-
-						logger.warning(f"The Trillian API expected a file to be located at '{url[0:-len(ext)]}'; found instead at '{url}'.")
-						if self.cache.decompressDownloads:
-							self._filepath = self._download_compressed_file(url=url, ext=ext, path=path)
-							self._filename = p.name
-							return self.filepath
-						else:
-							response = requests.get(url, stream=True)
-							self.filename = os.path.basename(url) # update filename to have the compressed extension
-							destination_file = self.cache.path / self.pathWithinCache() / self._filename
-							logger.debug(f"destination_file={destination_file}")
-							logger.debug(f"url={url}")
-							# download below
-						break
-
-				if file_found is False:
+				# where are you mr file?
+				ext = self._find_compressed_extension(url)
+				if ext is not None: # found file
+					url = url + ext
+
+					logger.warning(f"The Trillian API expected a file to be located at '{url[0:-len(ext)]}'; found instead at '{url}'.")
+					if self.cache.decompressDownloads:
+						self._filepath = self._download_compressed_file(url=url, ext=ext, path=path)
+						self._filename = self._filepath.name
+						return self.filepath
+					else:
+						response = self._session.get(url, stream=True)
+						self.filename = os.path.basename(url) # update filename to have the compressed extension
+						destination_file = path / self._filename
+						logger.debug(f"destination_file={destination_file}")
+						logger.debug(f"url={url}")
+						# download below
+				else:
 					logger.warning(f"No file was found as expected at '{url}' or with any known compression extension.")
 					raise exc.FileResourceCouldNotBeFound(f"No file found where the Trillian API service expected to be found (even after looking for compressed versions of the file ('{url}').")
 			else:
 				raise NotImplementedError(f"Encountered status {response.status_code} in file download request, but not handled.")
 
 		# file found, download
+		if self._can_download_in_ranges(response):
+			# large file on a server that supports range requests; download it over several connections
+			size = int(response.headers["Content-Length"])
+			response.close()
+			if self._download_in_ranges(url=url, destination_file=destination_file, size=size):
+				set_file_time_to_last_modified(destination_file, response)
+				return destination_file
+			# the server didn't honour the ranges; download normally
+			response = self._session.get(url, stream=True)
+			try:
+				response.raise_for_status() # don't write an error page to the file
+			except requests.HTTPError:
+				response.close()
+				raise
+
 		try:
 			# Ref: https://2.python-requests.org//en/latest/user/quickstart/#raw-response-content
 			#destination_file = self.cache.path / self.pathWithinCache() / self.filename
 			# stream data straight to disk instead of loading whole file into RAM
-			with open(destination_file, mode='wb') as f:
-				for chunk in response.iter_content(chunk_size=io.DEFAULT_BUFFER_SIZE):
-					# chunk_size in bytes
-					f.write(chunk)
-
-			# set file time to that on server
-			set_file_time_to_last_modified(destination_file, response)
+			# (copyfileobj reads into a reused buffer rather than creating a new bytes object per chunk)
+			response.raw.decode_content = True # undo any HTTP transfer encoding
+			expected_size = None # the size of the file if known from the headers (Content-Length is the encoded size otherwise)
+			if "Content-Length" in response.headers and "Content-Encoding" not in response.headers:
+				expected_size = int(response.headers["Content-Length"])
+			# written under a temporary name so that a partial file is never left where it would be taken as cached
+			with _writing_file(destination_file) as temporary:
+				fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o666)
+				with response, os.fdopen(fd, mode='wb', buffering=_COPY_BUFFER_SIZE) as f:
+					if expected_size is not None:
+						# reserve the space up front so the file is allocated contiguously
+						_preallocate(fd, expected_size)
+					try:
+						shutil.copyfileobj(response.raw, f, _COPY_BUFFER_SIZE)
+					except ProtocolError as e: # e.g. the connection closed before Content-Length bytes were sent
+						raise exc.IncompleteDownload(f"Incomplete download of '{url}' (received {f.tell()} of {expected_size} bytes): {e}") from e
+					# check as the data is written rather than stat-ing the file afterwards
+					if expected_size is not None and f.tell() != expected_size:
+						raise exc.IncompleteDownload(f"Incomplete download of '{url}' (received {f.tell()} of {expected_size} bytes).")
+					f.truncate() # size reserved for an encoded response may differ from the data written
+
+					# set file time to that on server
+					set_file_time_to_last_modified(temporary, response, f=f)
 			return destination_file
 
 		except requests.HTTPError as e:
@@ -545,6 +894,157 @@ class SciDDFileResource:
 			# - etc.
 			raise NotImplementedError()
 
+	def downloadByteRange(self, start:int, length:int) -> bytes:
+		'''
+		Return a range of bytes from the resource without downloading the whole file.
+
+		This is useful when only a small part of a large file is needed (e.g. a single header or extension).
+		If the file is already in the cache it is read from there, otherwise only the requested bytes are
+		requested from the server (an HTTP range request). The bytes are not written to the cache.
+
+		:param start: the offset of the first byte to read
+		:param length: the number of bytes to read
+		:returns: the bytes read; fewer than ``length`` bytes are returned if the range extends past the end of the file
+		'''
+		if start < 0 or length < 0:
+			raise ValueError(f"The start and length of a byte range must not be negative (start={start}, length={length}).")
+		if length == 0:
+			return b""
+
+		if self._filepath is not None or self.isInCache():
+			filepath = self._filepath or self.cache.path / self.pathWithinCache() / self.filename
+			if not filepath.name.lower().endswith(_COMPRESSED_DOT_FILE_EXTENSIONS_TUPLE):
+				with open(filepath, 'rb') as f:
+					f.seek(start)
+					return f.read(length)
+
+		url = self.url
+		if url.lower().endswith(_COMPRESSED_DOT_FILE_EXTENSIONS_TUPLE):
+			raise NotImplementedError(f"Reading a byte range of a file that is compressed on the server is not supported ('{url}').")
+
+		headers = {"Range":f"bytes={start}-{start + length - 1}", "Accept-Encoding":"identity"}
+		with self._session.get(url, headers=headers, stream=True) as response:
+			if response.status_code == 416: # "Range Not Satisfiable", i.e. starts past the end of the file
+				return b""
+			response.raise_for_status()
+			if response.status_code == 206: # "Partial Content"
+				return response.raw.read(length)
+			# the server ignored the range and is sending the whole file; skip to the start of the range
+			logger.debug(f"The server did not honour a range request for '{url}'; reading from the start of the file.")
+			remaining = start
+			while remaining > 0:
+				skipped = len(response.raw.read(min(remaining, _COPY_BUFFER_SIZE)))
+				if skipped == 0:
+					return b""
+				remaining -= skipped
+			return response.raw.read(length)
+
+	def _find_compressed_extension(self, url:str) -> str:
+		'''
+		Look for a compressed version of a file that is not found on the server at the given URL.
+
+		All extensions are probed at once over the pooled connections rather than one after another;
+		the first extension (in the order of ``COMPRESSED_DOT_FILE_EXTENSIONS``) found is returned
+		as soon as it's known without waiting on the remaining requests.
+
+		Extensions found are remembered for the life of the process so that the same file is
+		not probed again (e.g. when downloaded again after being removed from the cache);
+		files not found at all are not remembered as they may appear later.
+
+		:param url: the URL of the uncompressed file
+		:returns: the extension (e.g. ".gz") that when appended to ``url`` is found, or ``None`` if none are
+		'''
+		with _compressed_extensions_lock:
+			ext = _compressed_extensions.get(url)
+			if ext is not None:
+				_compressed_extensions.move_to_end(url)
+				return ext
+
+		executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(COMPRESSED_DOT_FILE_EXTENSIONS))
+		futures = list()
+		try:
+			for ext in COMPRESSED_DOT_FILE_EXTENSIONS:
+				futures.append(executor.submit(self._session.head, url+ext, allow_redirects=True))
+			for ext, future in zip(COMPRESSED_DOT_FILE_EXTENSIONS, futures):
+				if future.result().status_code == 200:
+					break
+			else:
+				return None
+		finally:
+			# don't wait on the remaining probes (shutdown's 'cancel_futures' requires Python 3.9)
+			for future in futures:
+				future.cancel()
+			executor.shutdown(wait=False)
+
+		with _compressed_extensions_lock:
+			_compressed_extensions[url] = ext
+			if len(_compressed_extensions) > _COMPRESSED_EXTENSIONS_CACHE_SIZE:
+				_compressed_extensions.popitem(last=False) # least recently used
+		return ext
+
+	def _can_download_in_ranges(self, response:requests.Response) -> bool:
+		'''
+		Returns ``True`` if the file in the given (streamed) response should be downloaded using parallel range requests.
+		'''
+		if self.parallel_download_connections < 2 or not hasattr(os, "pwrite"):
+			return False
+		headers = response.headers
+		if headers.get("Accept-Ranges") != "bytes" or "Content-Encoding" in headers:
+			return False
+		try:
+			return int(headers["Content-Length"]) >= self.parallel_download_min_size
+		except (KeyError, ValueError):
+			return False
+
+	def _download_in_ranges(self, url:str, destination_file:pathlib.Path, size:int) -> bool:
+		'''
+		Download a file as several byte ranges requested in parallel, each written at its offset in the destination file.
+
+		A single connection is often limited by TCP congestion control on long distance links;
+		several connections can use more of the available bandwidth (see RFC 7233 for range requests).
+
+		:param url: the URL of the file to download
+		:param destination_file: the full path of the file to write
+		:param size: the size of the file in bytes
+		:returns: ``True`` if the file was downloaded, ``False`` if the server did not return partial content for every range, e.g. it ignored the ranges or returned an error (nothing is written)
+		'''
+		connections = min(self.parallel_download_connections, 8)
+		range_size = -(-size // connections) # ceiling division
+		ranges = [(start, min(start + range_size, size) - 1) for start in range(0, size, range_size)]
+
+		def download_range(start:int, end:int) -> bool:
+			# (the ranges are of the file as stored, so it must not be sent with a content encoding)
+			with self._session.get(url, headers={"Range":f"bytes={start}-{end}", "Accept-Encoding":"identity"}, stream=True) as response:
+				if response.status_code != 206: # "Partial Content"
+					return False # the caller downloads the file normally instead
+				offset = start
+				try:
+					for chunk in response.iter_content(chunk_size=_COPY_BUFFER_SIZE):
+						os.pwrite(fd, chunk, offset)
+						offset += len(chunk)
+				except requests.exceptions.ChunkedEncodingError: # (how requests reports a connection closed early)
+					pass # raised below
+			if offset != end + 1:
+				raise exc.IncompleteDownload(f"Incomplete download of bytes {start}-{end} of '{url}' (received {offset - start} bytes).")
+			return True
+
+		# written under a temporary name and moved into place once every range has been received
+		temporary = _temporary_path(destination_file)
+		completed = False
+		fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+		try:
+			_preallocate(fd, size)
+			with concurrent.futures.ThreadPoolExecutor(max_workers=connections) as executor:
+				futures = [executor.submit(download_range, start, end) for start, end in ranges]
+				completed = all([future.result() for future in futures])
+		finally:
+			os.close(fd)
+			if not completed:
+				_remove(temporary)
+		if completed:
+			os.replace(temporary, destination_file)
+		return completed
+
 	def _download_compressed_file(self, url:str, ext:str, path:os.pathLike) -> os.pathLike:
 		'''
 		Download the provided file that's compressed on the remote server and decompress the returned file.
@@ -557,14 +1057,10 @@ class SciDDFileResource:
 		:returns: path (including filename) the file was downloaded to
 		'''
 		# File is compressed on remote server. Download and decompress.
-		if ext in [".gz"]:
-			return self._download_gz_file(url=url, path=path)
-		elif ext in [".bz2", ".bzip2"]:
-			return self._download_bz2_file(url=url, path=path)
-		elif ext in [".zip"]:
-			return self._download_zip_file(url=url, path=path)
-		else:
+		method_name = self._decompressing_downloaders.get(ext)
+		if method_name is None:
 			raise NotImplementedError(f"Files compressed with the extension '{ext}' are not yet supported.")
+		return getattr(self, method_name)(url=url, path=path)
 
 	def _download_gz_file(self, url:str, path:pathlib.Path):
 		'''
@@ -574,25 +1070,27 @@ class SciDDFileResource:
 		:param path: the local location where to download the file to
 		:returns: path (including filename) the file was downloaded to
 		'''
-		response = requests.get(url=url)
-		try:
-			response.raise_for_status()
-		except requests.HTTPError:
-			if response.status_code == 404:
-				# handle error
-				raise NotImplementedError()
-
-		ext = os.path.splitext(self.url)[1]
-		#fname = self.filename[:-len(ext)]
-		#logger.debug(f"fname={fname}")
-		path_to_write = path / self.filename # the SciDD will have the uncompressed filename
-		logger.debug(f"About to write file to: {path} / {self.filename}")
-
-		with open(path_to_write, 'wb') as f:
-			shutil.copyfileobj(io.BytesIO(gzip.decompress(response.content)), f)
-
-		# set file time to that on server
-		set_file_time_to_last_modified(path_to_write, response)
+		# stream the response through the decompressor straight to disk rather than reading the whole file into memory
+		with self._session.get(url=url, stream=True) as response:
+			try:
+				response.raise_for_status()
+			except requests.HTTPError:
+				if response.status_code == 404:
+					# handle error
+					raise NotImplementedError()
+
+			#ext = os.path.splitext(self.url)[1]
+			#fname = self.filename[:-len(ext)]
+			#logger.debug(f"fname={fname}")
+			path_to_write = path / self.filename # the SciDD will have the uncompressed filename
+			logger.debug(f"About to write file to: {path} / {self.filename}")
+
+			response.raw.decode_content = True # undo any HTTP transfer encoding, leaving the gzip file itself
+			with _writing_file(path_to_write) as temporary, open(temporary, 'wb') as f:
+				_decompress_stream(response.raw, lambda: _gzip_zlib.decompressobj(zlib.MAX_WBITS | 16), f) # gzip header and trailer
+
+				# set file time to that on server
+				set_file_time_to_last_modified(temporary, response, f=f)
 
 		return path_to_write
 
@@ -604,24 +1102,25 @@ class SciDDFileResource:
 		:param path: the local location where to download the file to
 		:returns: path (including filename) the file was downloaded to
 		'''
-		response = requests.get(url=url)
-		try:
-			response.raise_for_status()
-		except requests.HTTPError:
-			if response.status_code == 404:
-				# handle error
-				raise NotImplementedError()
-
-		#ext = os.path.splitext(self.url)[1]
-		#fname = filename[:-len(ext)]
-		#logger.debug(f"fname={fname}")
-		path_to_write = path / self.filename # the SciDD will have the uncompressed filename
-		logger.debug(f"About to write file to: {path_to_write}")
-
-		with open(path_to_write, 'wb') as f:
-			shutil.copyfileobj(io.BytesIO(bz2.decompress(response.content)), f)
-
-		set_file_time_to_last_modified(path_to_write, response)
+		# stream the response through the decompressor straight to disk rather than reading the whole file into memory
+		with self._session.get(url=url, stream=True) as response:
+			try:
+				response.raise_for_status()
+			except requests.HTTPError:
+				if response.status_code == 404:
+					# handle error
+					raise NotImplementedError()
+
+			#ext = os.path.splitext(self.url)[1]
+			#fname = filename[:-len(ext)]
+			#logger.debug(f"fname={fname}")
+			path_to_write = path / self.filename # the SciDD will have the uncompressed filename
+			logger.debug(f"About to write file to: {path_to_write}")
+
+			response.raw.decode_content = True # undo any HTTP transfer encoding, leaving the bz2 file itself
+			with _writing_file(path_to_write) as temporary, open(temporary, 'wb') as f:
+				_decompress_stream(response.raw, bz2.BZ2Decompressor, f)
+				set_file_time_to_last_modified(temporary, response, f=f)
 
 		return path_to_write
 
@@ -633,23 +1132,36 @@ class SciDDFileResource:
 		:param path: the local location where to download the file to
 		:returns: path (including filename) the file was downloaded to
 		'''
-		response = requests.get(url=url)
-		try:
-			response.raise_for_status()
-		except requests.HTTPError:
-			if response.status_code == 404:
-				raise NotImplementedError() # handle error
-
-		#ext = os.path.splitext(self.url)[1]
-		#fname = filename[:-len(ext)]
-		#logger.debug(f"fname={fname}")
-		path_to_write = path / self.filename # the SciDD will have the uncompressed filename
-		logger.debug(f"About to write file to: {path_to_write}")
-
-		# note: zip files can contain multiple files
-		# todo(?) support extracting metadata for multiple files in a zip archive
-		ZipFile.extract(member=ZipFile(file=io.BytesIO(data)), path=path)
-
-		set_file_time_to_last_modified(path_to_write, response)
+		from zipfile import ZipFile # imported here as zip archives are rare; this keeps it out of the import time of the package
+
+		with self._session.get(url=url, stream=True) as response:
+			try:
+				response.raise_for_status()
+			except requests.HTTPError:
+				if response.status_code == 404:
+					raise NotImplementedError() # handle error
+
+			#ext = os.path.splitext(self.url)[1]
+			#fname = filename[:-len(ext)]
+			#logger.debug(f"fname={fname}")
+			path_to_write = path / self.filename # the SciDD will have the uncompressed filename
+			logger.debug(f"About to write file to: {path_to_write}")
+
+			# Reading a zip file needs random access, so the archive is streamed to a temporary
+			# file; small archives stay in memory, larger ones spill to disk next to the destination.
+			with tempfile.SpooledTemporaryFile(max_size=_ZIP_SPOOL_SIZE, dir=path) as archive:
+				response.raw.decode_content = True # undo any HTTP transfer encoding, leaving the zip file itself
+				shutil.copyfileobj(response.raw, archive, _COPY_BUFFER_SIZE)
+
+				with ZipFile(archive) as zip_file:
+					# note: zip files can contain multiple files
+					# todo(?) support extracting metadata for multiple files in a zip archive
+					names = [name for name in zip_file.namelist() if not name.endswith("/")]
+					if len(names) == 0:
+						raise exc.FileResourceCouldNotBeFound(f"The zip file at '{url}' is empty.")
+					member = next((name for name in names if os.path.basename(name) == self.filename), names[0])
+					with zip_file.open(member) as source, _writing_file(path_to_write) as temporary, open(temporary, 'wb') as f:
+						shutil.copyfileobj(source, f, _COPY_BUFFER_SIZE)
+						set_file_time_to_last_modified(temporary, response, f=f)
 
 		return path_to_write
@@ -2,39 +2,17 @@
 
 ''' This file collects classes that implement useful design patterns in Python. '''
 
-
-# used by memoize
-import collections
 import functools
 
-#
-# Taken from: http://wiki.python.org/moin/PythonDecoratorLibrary#Memoize
-#
-class memoize(object):
+def memoize(func):
 	'''Decorator. Caches a function's return value each time it is called.
 	If called later with the same arguments, the cached value is returned
 	(not reevaluated).
+
+	This is :py:func:`functools.lru_cache` with no size limit; arguments (including keyword arguments)
+	must be hashable. When used on a method the instance is part of the key and is kept alive by the cache.
 	'''
-	def __init__(self, func):
-		self.func = func
-		self.cache = {}
-	def __call__(self, *args):
-		if not isinstance(args, collections.Hashable):
-			# uncacheable. a list, for instance.
-			# better to not cache than blow up.
-			return self.func(*args)
-		if args in self.cache:
-			return self.cache[args]
-		else:
-			value = self.func(*args)
-			self.cache[args] = value
-			return value
-	def __repr__(self):
-		'''Return the function's docstring.'''
-		return self.func.__doc__
-	def __get__(self, obj, objtype):
-		'''Support instance methods.'''
-		return functools.partial(self.__call__, obj)
+	return functools.lru_cache(maxsize=None)(func)
 
 #
 # See also: http://wiki.python.org/moin/PythonDecoratorLibrary#Singleton
@@ -74,7 +52,8 @@ class SingletonMeta(type):
         Possible changes to the value of the `__init__` argument do not affect
         the returned instance.
         """
-        if cls not in cls._instances:
-            instance = super().__call__(*args, **kwargs)
-            cls._instances[cls] = instance
-        return cls._instances[cls]
+        instance = cls._instances.get(cls) # one dictionary lookup once the instance exists
+        if instance is None:
+            # setdefault: if two threads create the first instance at the same time, both get the same one
+            instance = cls._instances.setdefault(cls, super().__call__(*args, **kwargs))
+        return instance
@@ -69,5 +69,9 @@ setup(
 	zip_safe=False,
 	#include_dirs=['trillian/core', 'trillian/dataset'],
 	data_files=data_files,
+	extras_require={
+		# optional accelerators: faster gzip decompression of downloads and JSON parsing of API responses
+		"fast" : ["isal", "orjson"]
+	},
 	python_requires='>=3.6'
 )
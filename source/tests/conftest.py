@@ -1,10 +1,34 @@
 
 import pytest
 import pathlib
+import threading
+import socketserver
+import http.server
 
-from scidd import SciDDCacheManager
+from scidd.core import SciDDCacheManager
 
 @pytest.fixture
 def temporary_cache():
 	temporary_cache = SciDDCacheManager(path=pathlib.Path(__file__).parent / "scidd_test_cache")
 	return temporary_cache
+
+class _LocalServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+	daemon_threads = True
+
+@pytest.fixture
+def local_server():
+	'''
+	Start HTTP servers on localhost that run for the duration of a test.
+
+	The fixture is a function that takes a request handler class and returns the base URL of the server, e.g. "http://127.0.0.1:50000".
+	'''
+	servers = list()
+	def start(handler_class) -> str:
+		server = _LocalServer(("127.0.0.1", 0), handler_class)
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+		servers.append(server)
+		return f"http://127.0.0.1:{server.server_port}"
+	yield start
+	for server in servers:
+		server.shutdown()
+		server.server_close()
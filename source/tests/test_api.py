@@ -0,0 +1,161 @@
+
+import json
+import time
+import http.server
+
+import pytest
+
+from scidd.core import API, SciDDCacheManager
+
+ETAG = '"v1"'
+
+class _ETagHandler(http.server.BaseHTTPRequestHandler):
+	'''
+	Returns ``{"path": <request path>}`` with an ETag, or "304 Not Modified" if the request's ``If-None-Match`` header matches it.
+	'''
+	requests_received = list() # (path, If-None-Match header) of each request
+
+	def log_message(self, format, *args):
+		pass # keep the test output quiet
+
+	def do_GET(self):
+		_ETagHandler.requests_received.append((self.path, self.headers.get("If-None-Match")))
+		if self.headers.get("If-None-Match") == ETAG:
+			self.send_response(304)
+			self.send_header("ETag", ETAG)
+			self.end_headers()
+			return
+		body = json.dumps({"path":self.path}).encode()
+		self.send_response(200)
+		self.send_header("ETag", ETAG)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def do_POST(self):
+		body = self.rfile.read(int(self.headers["Content-Length"]))
+		_ETagHandler.requests_received.append((self.path, body))
+		body = json.dumps({"path":self.path, "body":body.decode()}).encode()
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+@pytest.fixture
+def api(tmp_path, monkeypatch, local_server):
+	'''
+	The API pointed at a local server, with its responses cached in a temporary directory.
+	'''
+	_ETagHandler.requests_received = list()
+	port = int(local_server(_ETagHandler).rsplit(":", 1)[1])
+	monkeypatch.setattr(SciDDCacheManager, "_default_instance", SciDDCacheManager(path=tmp_path))
+
+	api = API() # a singleton; restore its settings afterwards
+	saved = (api.host, api.port, api.scheme, api.cache_ttl, api.use_local_cache)
+	api.host = "127.0.0.1"
+	api.port = port
+	api.use_local_cache = True
+	yield api
+
+	api.localAPICache.flush() # wait for the background writes
+	api.localAPICache.close()
+	api.host, api.port, api.scheme, api.cache_ttl, api.use_local_cache = saved
+
+def test_get_within_ttl_is_not_sent(api):
+	'''
+	A response cached less than ``cache_ttl`` seconds ago is returned without contacting the server.
+	'''
+	api.cache_ttl = 3600
+	first = api.get("/files", params={"a":1})
+	second = api.get("/files", params={"a":1})
+
+	assert first == second == {"path":"/files?a=1"}
+	assert len(_ETagHandler.requests_received) == 1
+
+def test_expired_entry_is_revalidated(api):
+	'''
+	An expired entry is sent to the server with its ETag, and the cached response is used when the server replies "304 Not Modified".
+	'''
+	api.cache_ttl = 0 # entries expire immediately
+	api.get("/files")
+
+	assert api.get("/files") == {"path":"/files"}
+	assert _ETagHandler.requests_received == [("/files", None), ("/files", ETAG)]
+
+def test_not_modified_renews_entry(api):
+	'''
+	A "304 Not Modified" reply renews the cached entry for another ``cache_ttl`` seconds.
+	'''
+	api.cache_ttl = 0
+	api.get("/files")
+	api.cache_ttl = 3600
+	api.get("/files") # revalidated
+	api.get("/files") # fresh again; not sent
+
+	assert len(_ETagHandler.requests_received) == 2
+	record = api.localAPICache.record(f"{api.base_url}/files?")
+	assert record["etag"] == ETAG
+	assert record["expires"] > time.time()
+
+def test_list_of_tuples_params(api):
+	'''
+	Parameters can be given as a list of ``(name, value)`` tuples, as with requests.
+	'''
+	api.cache_ttl = 3600
+	assert api.get("/files", params=[("b", 2), ("a", 1)]) == {"path":"/files?b=2&a=1"}
+	assert api.get("/files", params={"a":1, "b":2}) == {"path":"/files?b=2&a=1"} # the same query, so cached
+	assert len(_ETagHandler.requests_received) == 1
+
+def test_unusable_cache(api, tmp_path, monkeypatch):
+	'''
+	If the local API cache can't be used, the server is asked instead.
+	'''
+	not_a_directory = tmp_path / "not_a_directory"
+	not_a_directory.write_text("")
+	monkeypatch.setattr(SciDDCacheManager, "_default_instance", SciDDCacheManager(path=not_a_directory))
+
+	assert api.get("/files") == {"path":"/files"}
+	assert api.get("/files") == {"path":"/files"}
+	assert len(_ETagHandler.requests_received) == 2
+
+class _UnavailableHandler(http.server.BaseHTTPRequestHandler):
+	'''
+	Always returns "503 Service Unavailable".
+	'''
+	def log_message(self, format, *args):
+		pass
+
+	def do_GET(self):
+		self.send_response(503)
+		self.send_header("Content-Length", "0")
+		self.end_headers()
+
+def test_retries_exhausted(api, local_server):
+	'''
+	When the server keeps returning an error that is retried, the HTTP error is raised once the retries are used up.
+	'''
+	api.port = int(local_server(_UnavailableHandler).rsplit(":", 1)[1])
+
+	with pytest.raises(Exception, match="status code: 503"): # not requests.exceptions.RetryError
+		api.get("/files")
+
+def test_post(api):
+	'''
+	POST calls send the body and are not cached.
+	'''
+	assert api.post("/files", data={"a":1}) == {"path":"/files", "body":"a=1"}
+	api.post("/files", data={"a":1})
+	assert len(_ETagHandler.requests_received) == 2
+
+def test_get_many(api):
+	'''
+	Several calls made at once return their responses in the order of the calls, and are cached.
+	'''
+	api.cache_ttl = 3600
+	calls = [("/files", {"a":i}) for i in range(10)]
+
+	assert api.getMany(calls, max_workers=4) == [{"path":f"/files?a={i}"} for i in range(10)]
+	assert api.getMany(calls) == [{"path":f"/files?a={i}"} for i in range(10)]
+	assert len(_ETagHandler.requests_received) == 10
@@ -0,0 +1,208 @@
+
+import sys
+import pathlib
+import sqlite3
+import threading
+import contextlib
+import subprocess
+
+import pytest
+
+from scidd.core import LocalAPICache
+from scidd.core.cache import DATABASE_VERSION
+
+DATABASE_NAME = "_SciDD_API_Cache.sqlite"
+
+def _create_version_1_database(filepath):
+	'''
+	Create an API cache database as written by the first version of LocalAPICache (schema version 1).
+	'''
+	with contextlib.closing(sqlite3.connect(filepath)) as connection:
+		connection.execute("CREATE TABLE metadata (id INTEGER PRIMARY KEY, date_created DATE, database_version INTEGER);")
+		connection.execute("INSERT INTO metadata (id, date_created, database_version) VALUES (1, CURRENT_TIMESTAMP, 1);")
+		connection.execute("CREATE TABLE cache (id INTEGER PRIMARY KEY AUTOINCREMENT, query TEXT UNIQUE, json_response TEXT);")
+		connection.execute("CREATE UNIQUE INDEX query_idx ON cache(query)")
+		connection.execute("INSERT INTO cache (query, json_response) VALUES (?, ?)", ("old query", '{"old": true}'))
+		connection.commit()
+
+def test_migrate_version_1_database(tmp_path):
+	'''
+	An existing database from the first version is upgraded to the current schema when opened.
+	'''
+	_create_version_1_database(tmp_path / DATABASE_NAME)
+
+	cache = LocalAPICache(path=tmp_path)
+	try:
+		with pytest.raises(KeyError):
+			cache["old query"] # the cache table is recreated, not migrated
+		cache["new query"] = '{"a": 1}'
+	finally:
+		cache.close()
+
+	# read back with a new instance so the value comes from the database, not memory
+	cache = LocalAPICache(path=tmp_path)
+	try:
+		assert cache["new query"] == '{"a": 1}'
+		assert cache.parsedValue("new query") == {"a":1}
+		assert cache.record("new query")["expires"] is None
+	finally:
+		cache.close()
+
+	with contextlib.closing(sqlite3.connect(tmp_path / DATABASE_NAME)) as connection:
+		version = connection.execute("SELECT database_version FROM metadata WHERE id=1").fetchone()[0]
+		table_sql = connection.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='cache'").fetchone()[0]
+		columns = [row[1] for row in connection.execute("PRAGMA table_info(cache)")]
+		indexes = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='cache'")]
+
+	assert version == DATABASE_VERSION
+	assert "WITHOUT ROWID" in table_sql
+	assert columns == ["query", "json_response", "expires", "etag", "last_modified"]
+	assert "query_idx" not in indexes
+
+def test_background_write(tmp_path):
+	'''
+	A value set in the background can be read right away and is written to the database.
+	'''
+	cache = LocalAPICache(path=tmp_path)
+	try:
+		cache.set("key", '{"a": 1}', background=True)
+		assert cache["key"] == '{"a": 1}'
+		cache.flush()
+	finally:
+		cache.close()
+
+	cache = LocalAPICache(path=tmp_path)
+	try:
+		assert cache["key"] == '{"a": 1}'
+	finally:
+		cache.close()
+
+_WRITE_AT_EXIT_SCRIPT = '''
+import sys
+import atexit
+from scidd.core import LocalAPICache
+
+cache = LocalAPICache(path=sys.argv[1])
+# registered first, so this runs after the background writer has been shut down
+atexit.register(lambda: cache.set("late", "-1", background=True))
+for i in range(100):
+	cache.set(f"key{i}", str(i), background=True)
+'''
+
+def test_background_writes_complete_at_exit(tmp_path):
+	'''
+	Values set in the background are all written when the program exits, including those set in atexit handlers.
+	'''
+	source_directory = pathlib.Path(__file__).parent.parent
+	subprocess.run([sys.executable, "-c", _WRITE_AT_EXIT_SCRIPT, str(tmp_path)], cwd=source_directory, check=True, timeout=60)
+
+	cache = LocalAPICache(path=tmp_path)
+	try:
+		assert [cache[f"key{i}"] for i in range(100)] == [str(i) for i in range(100)]
+		assert cache["late"] == "-1"
+	finally:
+		cache.close()
+
+def test_threads_share_one_writer(tmp_path):
+	'''
+	Writes from many (short lived) threads don't each leave a connection open.
+	'''
+	cache = LocalAPICache(path=tmp_path)
+	try:
+		cache["key0"] = "0"
+		threads = [threading.Thread(target=cache.__setitem__, args=(f"key{i}", str(i))) for i in range(50)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		assert len(cache._connections) == 1
+		assert [cache[f"key{i}"] for i in range(50)] == [str(i) for i in range(50)]
+	finally:
+		cache.close()
+
+def _create_empty_wal_database(filepath):
+	with contextlib.closing(sqlite3.connect(filepath)) as connection:
+		connection.execute("PRAGMA journal_mode=WAL") # writes the file header, but no tables
+
+@pytest.mark.parametrize("create_file", [lambda filepath: filepath.touch(), _create_empty_wal_database], ids=["empty file", "no tables"])
+def test_database_without_schema(tmp_path, create_file):
+	'''
+	A database file left without a schema (e.g. by an interrupted first run) is initialized rather than making the cache unusable.
+	'''
+	create_file(tmp_path / DATABASE_NAME)
+
+	cache = LocalAPICache(path=tmp_path)
+	try:
+		with pytest.raises(KeyError):
+			cache["key"]
+		cache["key"] = "1"
+		assert cache["key"] == "1"
+	finally:
+		cache.close()
+
+def test_first_use_from_several_threads(tmp_path):
+	'''
+	A new database is created once when several threads start using the cache at the same time.
+	'''
+	cache = LocalAPICache(path=tmp_path)
+	errors = list()
+	def write(i:int):
+		try:
+			cache[f"key{i}"] = str(i)
+		except Exception as e:
+			errors.append(e)
+	try:
+		threads = [threading.Thread(target=write, args=(i,)) for i in range(20)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		assert errors == []
+		assert [cache[f"key{i}"] for i in range(20)] == [str(i) for i in range(20)]
+	finally:
+		cache.close()
+
+def test_set_many(tmp_path):
+	'''
+	Values set together are all written to the database.
+	'''
+	cache = LocalAPICache(path=tmp_path)
+	try:
+		cache["key0"] = "old"
+		cache.setMany([(f"key{i}", str(i)) for i in range(10)], ttl=3600)
+		assert cache["key0"] == "0"
+	finally:
+		cache.close()
+
+	cache = LocalAPICache(path=tmp_path)
+	try:
+		assert [cache[f"key{i}"] for i in range(10)] == [str(i) for i in range(10)]
+		assert cache.record("key0")["expires"] is not None
+	finally:
+		cache.close()
+
+def test_batch(tmp_path):
+	'''
+	Values set in a batch (including a nested one) are written when the outermost batch ends.
+	'''
+	cache = LocalAPICache(path=tmp_path)
+	try:
+		with cache.batch():
+			cache["key0"] = "0"
+			with cache.batch():
+				cache["key1"] = "1"
+			with pytest.raises(KeyError):
+				cache["key1"] # not written until the outer batch ends
+		assert cache["key0"] == "0"
+		assert cache["key1"] == "1"
+	finally:
+		cache.close()
+
+	cache = LocalAPICache(path=tmp_path)
+	try:
+		assert cache["key0"] == "0"
+		assert cache["key1"] == "1"
+	finally:
+		cache.close()
@@ -0,0 +1,356 @@
+
+import io
+import re
+import os
+import bz2
+import errno
+import gzip
+import time
+import zlib
+import zipfile
+import threading
+import http.server
+
+import pytest
+import requests
+
+from scidd.core import SciDD, SciDDFileResource, SciDDCacheManager, exc
+from scidd.core.scidd import _decompress_stream, _preallocate
+
+DATA = os.urandom(100_003) # not a multiple of the number of connections
+
+class _File(SciDD, SciDDFileResource):
+	def __init__(self, sci_dd:str):
+		SciDD.__init__(self, sci_dd)
+		SciDDFileResource.__init__(self)
+
+def _file(url:str, cache:SciDDCacheManager, filename:str=None) -> _File:
+	'''
+	Returns a file resource with a fixed URL (no resolver is needed); the filename is that of the URL unless given.
+	'''
+	f = _File("scidd:/test/" + (filename or url.rsplit("/", 1)[1]))
+	f.url = url
+	f.cache = cache
+	return f
+
+class _FileHandler(http.server.BaseHTTPRequestHandler):
+	'''
+	Serves the files in ``files`` (request path -> bytes), honouring byte range requests.
+	'''
+	files = dict()
+	range_status = 206 # status returned for range requests: 206 honours them, 200 ignores them (sends the whole file), others are errors
+	full_file_statuses = list() # statuses returned for successive requests of a whole file; 200 when empty
+	bytes_missing = 0 # the number of bytes at the end of each file or range not sent (though counted in Content-Length)
+	requests_received = list() # (path, Range header, Accept-Encoding header) of each request
+
+	def log_message(self, format, *args):
+		pass # keep the test output quiet
+
+	def do_GET(self):
+		cls = _FileHandler
+		data = cls.files.get(self.path)
+		byte_range = self.headers.get("Range")
+		cls.requests_received.append((self.path, byte_range, self.headers.get("Accept-Encoding")))
+
+		if data is None:
+			status = 404
+		elif byte_range is None:
+			status = cls.full_file_statuses.pop(0) if cls.full_file_statuses else 200
+		else:
+			status = cls.range_status
+
+		self.send_response(status)
+		if status == 206:
+			start, end = map(int, re.match(r"bytes=(\d+)-(\d+)", byte_range).groups())
+			body = data[start:end + 1]
+			self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+		elif status == 200:
+			body = data
+		else:
+			body = b"error"
+		self.send_header("Accept-Ranges", "bytes")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body[:len(body) - cls.bytes_missing] if status in (200, 206) else body)
+
+@pytest.fixture
+def server(local_server, monkeypatch) -> str:
+	'''
+	A local file server; returns its base URL.
+	'''
+	_FileHandler.files = {"/data.fits":DATA}
+	_FileHandler.range_status = 206
+	_FileHandler.full_file_statuses = list()
+	_FileHandler.bytes_missing = 0
+	_FileHandler.requests_received = list()
+	monkeypatch.setattr(SciDDFileResource, "parallel_download_min_size", 1024) # download the test file in ranges
+	return local_server(_FileHandler)
+
+@pytest.fixture
+def cache(tmp_path) -> SciDDCacheManager:
+	return SciDDCacheManager(path=tmp_path)
+
+def _range_requests() -> list:
+	return [r for r in _FileHandler.requests_received if r[1] is not None]
+
+def test_range_download_is_byte_exact(server, cache):
+	'''
+	A file downloaded over parallel range requests is reassembled exactly.
+	'''
+	f = _file(f"{server}/data.fits", cache)
+
+	assert f.filepath.read_bytes() == DATA
+	assert len(_range_requests()) == SciDDFileResource.parallel_download_connections
+	assert all(r[2] == "identity" for r in _range_requests())
+	assert os.listdir(f.filepath.parent) == ["data.fits"] # no temporary file left
+
+def test_server_ignoring_ranges(server, cache):
+	'''
+	If the server sends the whole file in reply to range requests, the file is downloaded normally.
+	'''
+	_FileHandler.range_status = 200
+	f = _file(f"{server}/data.fits", cache)
+
+	assert f.filepath.read_bytes() == DATA
+	assert len(_range_requests()) > 0
+
+def test_range_error_falls_back(server, cache):
+	'''
+	If range requests fail, the file is downloaded normally.
+	'''
+	_FileHandler.range_status = 500
+	f = _file(f"{server}/data.fits", cache)
+
+	assert f.filepath.read_bytes() == DATA
+
+def test_single_stream_download(server, cache):
+	'''
+	A file too small to download in ranges is downloaded over one connection, leaving no temporary file.
+	'''
+	_FileHandler.files["/small.fits"] = DATA[:1000]
+	f = _file(f"{server}/small.fits", cache)
+
+	assert f.filepath.read_bytes() == DATA[:1000]
+	assert _range_requests() == []
+	assert os.listdir(f.filepath.parent) == ["small.fits"]
+
+def test_failed_fallback_raises(server, cache, tmp_path):
+	'''
+	An error returned for the fallback download is raised rather than written to the file.
+	'''
+	_FileHandler.range_status = 500
+	_FileHandler.full_file_statuses = [200, 500] # the first request succeeds, the fallback fails
+	f = _file(f"{server}/data.fits", cache)
+
+	with pytest.raises(requests.HTTPError):
+		f.filepath
+	assert not (tmp_path / f.pathWithinCache() / "data.fits").exists()
+
+def test_download_gzip(server, cache):
+	'''
+	A file compressed on the server is decompressed as it's downloaded.
+	'''
+	_FileHandler.files["/data.fits.gz"] = gzip.compress(DATA)
+	cache.decompressDownloads = True
+	f = _file(f"{server}/data.fits.gz", cache, filename="data.fits")
+
+	assert f.filepath.read_bytes() == DATA
+
+def test_truncated_gzip_download_is_not_cached(server, cache, tmp_path):
+	'''
+	A compressed file that ends early raises an error and leaves nothing in the cache.
+	'''
+	compressed = gzip.compress(DATA)
+	_FileHandler.files["/data.fits.gz"] = compressed[:len(compressed) // 2]
+	cache.decompressDownloads = True
+	f = _file(f"{server}/data.fits.gz", cache, filename="data.fits")
+
+	with pytest.raises(EOFError):
+		f.filepath
+	assert not f.isInCache()
+	assert os.listdir(tmp_path / f.pathWithinCache()) == []
+
+@pytest.mark.skipif(not hasattr(os, "posix_fallocate"), reason="posix_fallocate is not available")
+def test_preallocate_unsupported(tmp_path, monkeypatch):
+	'''
+	If the file system doesn't support preallocation, the file is extended instead.
+	'''
+	def fallocate(fd, offset, size):
+		raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+	monkeypatch.setattr(os, "posix_fallocate", fallocate)
+	with open(tmp_path / "file", 'wb') as f:
+		_preallocate(f.fileno(), 1000)
+	assert (tmp_path / "file").stat().st_size == 1000
+
+@pytest.mark.skipif(not hasattr(os, "posix_fallocate"), reason="posix_fallocate is not available")
+def test_preallocate_disk_full(tmp_path, monkeypatch):
+	'''
+	A full disk is reported rather than hidden by extending the file.
+	'''
+	def fallocate(fd, offset, size):
+		raise OSError(errno.ENOSPC, "No space left on device")
+	monkeypatch.setattr(os, "posix_fallocate", fallocate)
+	with open(tmp_path / "file", 'wb') as f:
+		with pytest.raises(OSError) as error:
+			_preallocate(f.fileno(), 1000)
+	assert error.value.errno == errno.ENOSPC
+
+@pytest.mark.parametrize("size", [1000, len(DATA)], ids=["one connection", "ranges"])
+def test_incomplete_download(server, cache, tmp_path, size):
+	'''
+	A download that ends before the size given by the server raises an error and leaves nothing in the cache.
+	'''
+	_FileHandler.files["/file.fits"] = DATA[:size]
+	_FileHandler.bytes_missing = 100
+	f = _file(f"{server}/file.fits", cache)
+
+	with pytest.raises(exc.IncompleteDownload):
+		f.filepath
+	assert not f.isInCache()
+	assert os.listdir(tmp_path / f.pathWithinCache()) == []
+
+def test_download_zip(server, cache):
+	'''
+	The file in a zip archive on the server is extracted as it's downloaded.
+	'''
+	archive = io.BytesIO()
+	with zipfile.ZipFile(archive, 'w') as zip_file:
+		zip_file.writestr("data.fits", DATA)
+	_FileHandler.files["/data.fits.zip"] = archive.getvalue()
+	cache.decompressDownloads = True
+	f = _file(f"{server}/data.fits.zip", cache, filename="data.fits")
+
+	assert f.filepath.read_bytes() == DATA
+	assert os.listdir(f.filepath.parent) == ["data.fits"]
+
+def test_download_byte_range(server, cache):
+	'''
+	Only the requested bytes are requested from the server, and the file is not cached.
+	'''
+	f = _file(f"{server}/data.fits", cache)
+
+	assert f.downloadByteRange(1000, 200) == DATA[1000:1200]
+	assert _range_requests() == [("/data.fits", "bytes=1000-1199", "identity")]
+	assert not f.isInCache()
+
+def test_download_byte_range_past_end(server, cache):
+	'''
+	A range starting past the end of the file ("416 Range Not Satisfiable") returns no bytes.
+	'''
+	_FileHandler.range_status = 416
+	f = _file(f"{server}/data.fits", cache)
+
+	assert f.downloadByteRange(len(DATA) + 10, 200) == b""
+
+def test_download_byte_range_ignored(server, cache):
+	'''
+	If the server sends the whole file in reply to a range request, the requested bytes are read from it.
+	'''
+	_FileHandler.range_status = 200
+	f = _file(f"{server}/data.fits", cache)
+
+	assert f.downloadByteRange(1000, 200) == DATA[1000:1200]
+	assert f.downloadByteRange(len(DATA) - 10, 200) == DATA[-10:]
+
+class _SlowFileHandler(_FileHandler):
+	'''
+	Serves files slowly enough for concurrent requests to overlap, recording the most in flight at once.
+	'''
+	lock = threading.Lock()
+	in_flight = 0
+	max_in_flight = 0
+
+	def do_GET(self):
+		cls = _SlowFileHandler
+		with cls.lock:
+			cls.in_flight += 1
+			cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+		try:
+			time.sleep(0.05)
+			super().do_GET()
+		finally:
+			with cls.lock:
+				cls.in_flight -= 1
+
+@pytest.mark.parametrize("max_per_host", [None, 2])
+def test_download_many(server, cache, local_server, max_per_host):
+	'''
+	Files are downloaded concurrently, with no more than ``max_per_host`` at a time from one server.
+	'''
+	_SlowFileHandler.in_flight = _SlowFileHandler.max_in_flight = 0
+	_FileHandler.files = {f"/file{i}.fits":DATA[i * 100:(i + 1) * 100] for i in range(8)}
+	slow_server = local_server(_SlowFileHandler)
+	files = [_file(f"{slow_server}/file{i}.fits", cache) for i in range(8)]
+
+	paths = SciDDFileResource.downloadMany(files, max_workers=8, max_per_host=max_per_host)
+
+	assert [path.read_bytes() for path in paths] == [DATA[i * 100:(i + 1) * 100] for i in range(8)]
+	if max_per_host is None:
+		assert _SlowFileHandler.max_in_flight > 2
+	else:
+		assert _SlowFileHandler.max_in_flight <= max_per_host
+
+def _new_gzip_decompressor():
+	return zlib.decompressobj(zlib.MAX_WBITS | 16) # gzip header and trailer
+
+def test_decompress_gzip():
+	f = io.BytesIO()
+	_decompress_stream(io.BytesIO(gzip.compress(DATA)), _new_gzip_decompressor, f)
+	assert f.getvalue() == DATA
+
+def test_decompress_multiple_member_gzip():
+	'''
+	A gzip file of several concatenated members decompresses to all of them (as with the gzip command).
+	'''
+	f = io.BytesIO()
+	_decompress_stream(io.BytesIO(gzip.compress(DATA[:1000]) + gzip.compress(DATA[1000:])), _new_gzip_decompressor, f)
+	assert f.getvalue() == DATA
+
+def test_decompress_bz2():
+	f = io.BytesIO()
+	_decompress_stream(io.BytesIO(bz2.compress(DATA)), bz2.BZ2Decompressor, f)
+	assert f.getvalue() == DATA
+
+@pytest.mark.parametrize("compress, new_decompressor", [(gzip.compress, _new_gzip_decompressor), (bz2.compress, bz2.BZ2Decompressor)])
+def test_decompress_truncated(compress, new_decompressor):
+	compressed = compress(DATA)
+	with pytest.raises(EOFError):
+		_decompress_stream(io.BytesIO(compressed[:len(compressed) // 2]), new_decompressor, io.BytesIO())
+
+def test_decompress_read_error_after_write_error():
+	'''
+	If the source fails after writing has failed (with the queue of chunks full), the write error is raised rather than hanging.
+	'''
+	compressed = gzip.compress(DATA)
+	queue_filled = threading.Event()
+	write_failed = threading.Event()
+
+	class Source:
+		reads = 0
+		def read(self, size:int) -> bytes:
+			self.reads += 1
+			if self.reads > 9: # the consumer has taken the first chunk and the next eight fill the queue
+				queue_filled.set()
+				write_failed.wait()
+				raise OSError("connection reset")
+			return compressed[self.reads - 1:self.reads]
+
+	class Destination:
+		def write(self, data:bytes):
+			queue_filled.wait()
+			write_failed.set()
+			raise OSError("disk full")
+
+	errors = list()
+	def decompress():
+		try:
+			_decompress_stream(Source(), _new_gzip_decompressor, Destination())
+		except OSError as e:
+			errors.append(e)
+
+	thread = threading.Thread(target=decompress, daemon=True)
+	thread.start()
+	thread.join(timeout=10)
+
+	assert not thread.is_alive(), "decompression did not finish"
+	assert str(errors[0]) == "disk full"